@@ -1,14 +1,16 @@
 """
 Matching service for comparing user profiles with job requirements
 """
-from typing import Dict, List, Optional, Any, Tuple, Set
+from typing import Dict, FrozenSet, List, Optional, Any, Tuple, Set
 from datetime import datetime, timezone
+from functools import lru_cache
 import logging
+import re
 from sqlalchemy.orm import Session
 from app.models import User, Job, Match
 from app.services.llm import extract_job_requirements
 from app.utils.skill_aliases import normalize_skill
-from app.utils.skill_clusters import calculate_skill_similarity, get_related_skills
+from app.utils.skill_clusters import get_related_skills
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +41,78 @@ COMPATIBLE_CATEGORIES = {
     ("game", "3d"),
 }
 
+# Title keyword families for calculate_title_match (substring match on lowercased titles)
+TITLE_ROLE_KEYWORDS = {
+    "engineer": ("engineer", "developer", "programmer", "software", "backend", "frontend", "fullstack", "full-stack", "sde"),
+    "senior": ("senior", "sr", "lead", "principal", "staff"),
+    "manager": ("manager", "director", "head", "chief", "vp", "cto", "ceo"),
+    "designer": ("designer", "ux", "ui", "product design"),
+    "data": ("data", "analyst", "scientist", "ml", "machine learning", "ai"),
+    "devops": ("devops", "sre", "infrastructure", "platform", "cloud"),
+}
+
+# Seniority keywords for detect_job_seniority (substring match on lowercased titles; junior checked first)
+JUNIOR_TITLE_KEYWORDS = ("junior", "jr", "entry", "associate", "graduate", "intern", "trainee")
+SENIOR_TITLE_KEYWORDS = ("senior", "sr", "lead", "principal", "staff", "head", "director", "vp", "chief")
+
+# One C-level substring scan per seniority level instead of a Python loop over keywords
+_JUNIOR_TITLE_PATTERN = re.compile("|".join(map(re.escape, JUNIOR_TITLE_KEYWORDS)))
+_SENIOR_TITLE_PATTERN = re.compile("|".join(map(re.escape, SENIOR_TITLE_KEYWORDS)))
+
+# (fraction of the user's min_salary the job's salary_min reaches, score), highest band first
+SALARY_MATCH_BANDS = (
+    (0.9, 80.0),  # Close to minimum
+    (0.8, 60.0),  # Somewhat close
+)
+
+# (max years the user is short of experience_years_min, score), smallest gap first
+EXPERIENCE_GAP_BANDS = (
+    (1, 80.0),  # Close enough
+    (2, 60.0),
+)
+
+# Category weights for calculate_match_score (total = 100%)
+# Freshness added to encourage applying to recent jobs
+MATCH_SCORE_WEIGHTS = {
+    "skills": 0.35,          # 35% (reduced from 40% to add freshness)
+    "title": 0.20,           # 20% (prevents "Director" for ICs)
+    "location": 0.10,        # 10%
+    "salary": 0.10,          # 10%
+    "experience": 0.15,      # 15% (reduced from 20% to add freshness)
+    "freshness": 0.10,       # 10% (NEW - encourages recent jobs)
+}
+
+
+# Every title keyword mapped to the families of all keywords it contains (e.g. "sre" -> devops + senior via "sr")
+_TITLE_KEYWORD_ROLES = {
+    keyword: frozenset(
+        role for role, keywords in TITLE_ROLE_KEYWORDS.items()
+        if any(kw in keyword for kw in keywords)
+    )
+    for family in TITLE_ROLE_KEYWORDS.values()
+    for keyword in family
+}
+
+# Zero-width lookahead so one scan reports a keyword at every offset; longest first,
+# so a shorter keyword sharing that offset is a prefix covered by _TITLE_KEYWORD_ROLES
+_TITLE_KEYWORD_PATTERN = re.compile(
+    "(?=(%s))" % "|".join(map(re.escape, sorted(_TITLE_KEYWORD_ROLES, key=len, reverse=True)))
+)
+
+
+@lru_cache(maxsize=8192)
+def _title_roles(title_text: str) -> FrozenSet[str]:
+    """
+    Return the TITLE_ROLE_KEYWORDS families whose keywords appear in lowercased title_text.
+
+    Memoized: a user's target roles are classified once for every job scored, and
+    job titles repeat across postings and users.
+    """
+    roles: Set[str] = set()
+    for keyword in _TITLE_KEYWORD_PATTERN.findall(title_text):
+        roles |= _TITLE_KEYWORD_ROLES[keyword]
+    return frozenset(roles)
+
 
 def infer_career_category(skills: List[str]) -> Optional[str]:
     """
@@ -175,22 +249,15 @@ def calculate_skill_match_ratio(user_skills: List[str], job_skills: List[str]) -
     if not job_skills:
         return 0.0, 0, 0
 
-    user_skills_lower = {normalize_skill(s) for s in user_skills}
-    job_skills_lower = {normalize_skill(s) for s in job_skills}
-
-    # Count exact matches
-    matched = user_skills_lower & job_skills_lower
+    normalized_user_skills = {normalize_skill(s) for s in user_skills}
+    user_skill_keys = {s.casefold() for s in normalized_user_skills}
+    job_skill_keys = {normalize_skill(s).casefold() for s in job_skills}
 
-    # Also count semantic matches (via skill clusters)
-    for job_skill in job_skills_lower - matched:
-        for user_skill in user_skills_lower:
-            similarity = calculate_skill_similarity(user_skill, job_skill)
-            if similarity >= 0.5:  # Related skill
-                matched.add(job_skill)
-                break
+    # Count exact matches, plus semantic matches (via skill clusters)
+    matched = job_skill_keys & (user_skill_keys | _related_skill_keys(normalized_user_skills))
 
-    match_ratio = len(matched) / len(job_skills_lower) if job_skills_lower else 0.0
-    return match_ratio, len(matched), len(job_skills_lower)
+    match_ratio = len(matched) / len(job_skill_keys) if job_skill_keys else 0.0
+    return match_ratio, len(matched), len(job_skill_keys)
 
 
 def should_match_minimum_skills(
@@ -231,6 +298,29 @@ def should_match_minimum_skills(
     return True
 
 
+def _related_skill_keys(normalized_skills: Set[str]) -> Set[str]:
+    """Casefolded names of every skill sharing a cluster with one of the given normalized skills"""
+    related: Set[str] = set()
+    for skill in normalized_skills:
+        related.update(r.casefold() for r in get_related_skills(skill))
+    return related
+
+
+def _best_skill_similarity(skill: str, user_skill_keys: Set[str], related_skill_keys: Set[str]) -> float:
+    """
+    Best similarity between a normalized job skill and any of the user's normalized skills.
+
+    Exact and related (same cluster) matches are both set lookups on casefolded
+    names, the same keys calculate_skill_match_ratio compares.
+    """
+    key = skill.casefold()
+    if key in user_skill_keys:
+        return 1.0
+    if key in related_skill_keys:
+        return 0.5
+    return 0.0
+
+
 def calculate_skill_match(user_skills: List[str], job_requirements: Dict[str, Any]) -> Tuple[float, List[str], List[str], List[str]]:
     """
     Calculate skill match score with semantic matching (skill clusters).
@@ -253,8 +343,10 @@ def calculate_skill_match(user_skills: List[str], job_requirements: Dict[str, An
     if not user_skills:
         return 0.0, [], job_requirements.get("required_skills", []), []
 
-    # Normalize all skills
+    # Normalize all skills; casefolded keys give O(1) exact-match lookups
     normalized_user_skills = {normalize_skill(s) for s in user_skills}
+    user_skill_keys = {s.casefold() for s in normalized_user_skills}
+    related_skill_keys = _related_skill_keys(normalized_user_skills)
     required_skills = [normalize_skill(s) for s in job_requirements.get("required_skills", [])]
     nice_to_have = [normalize_skill(s) for s in job_requirements.get("nice_to_have_skills", [])]
 
@@ -265,34 +357,22 @@ def calculate_skill_match(user_skills: List[str], job_requirements: Dict[str, An
     required_total_score = 0.0
 
     for req_skill in required_skills:
-        best_similarity = 0.0
-        matched_by = None
+        similarity = _best_skill_similarity(req_skill, user_skill_keys, related_skill_keys)
 
-        for user_skill in normalized_user_skills:
-            similarity = calculate_skill_similarity(user_skill, req_skill)
-            if similarity > best_similarity:
-                best_similarity = similarity
-                matched_by = user_skill
-
-        if best_similarity == 1.0:
+        if similarity == 1.0:
             required_exact_matches.append(req_skill)
             required_total_score += 1.0
-        elif best_similarity >= 0.5:
+        elif similarity >= 0.5:
             required_related_matches.append(req_skill)
             required_total_score += 0.5
         else:
             required_missing.append(req_skill)
 
     # Calculate semantic score for nice-to-have skills
-    nice_to_have_score = 0.0
-    if nice_to_have:
-        for nth_skill in nice_to_have:
-            best_similarity = 0.0
-            for user_skill in normalized_user_skills:
-                similarity = calculate_skill_similarity(user_skill, nth_skill)
-                if similarity > best_similarity:
-                    best_similarity = similarity
-            nice_to_have_score += best_similarity
+    nice_to_have_score = sum(
+        _best_skill_similarity(nth_skill, user_skill_keys, related_skill_keys)
+        for nth_skill in nice_to_have
+    )
 
     # Calculate final score
     if not required_skills:
@@ -306,12 +386,14 @@ def calculate_skill_match(user_skills: List[str], job_requirements: Dict[str, An
         score = required_pct + nice_pct
 
     # Return original case for display
+    missing_set = set(required_missing)
+    related_set = set(required_related_matches)
     matching_skills_display = [s for s in job_requirements.get("required_skills", []) + job_requirements.get("nice_to_have_skills", [])
-                                if normalize_skill(s) in normalized_user_skills]
+                                if normalize_skill(s).casefold() in user_skill_keys]
     missing_skills_display = [s for s in job_requirements.get("required_skills", [])
-                               if normalize_skill(s) in required_missing]
+                               if normalize_skill(s) in missing_set]
     related_skills_display = [s for s in job_requirements.get("required_skills", [])
-                               if normalize_skill(s) in required_related_matches]
+                               if normalize_skill(s) in related_set]
 
     return round(score, 2), matching_skills_display, missing_skills_display, related_skills_display
 
@@ -385,9 +467,8 @@ def should_match_eligibility(user_preferences: Dict[str, Any], job: Job) -> bool
             pass  # Continue to visa check
         # Check if there's overlap between user regions and job regions
         else:
-            user_regions_lower = [r.lower() for r in user_regions]
-            job_regions_lower = [r.lower() for r in job_regions]
-            if not any(ur in job_regions_lower for ur in user_regions_lower):
+            user_region_keys = {r.casefold() for r in user_regions}
+            if user_region_keys.isdisjoint(r.casefold() for r in job_regions):
                 logger.info(f"Job {job.id} regions {job_regions} don't match user regions {user_regions}")
                 return False
 
@@ -403,6 +484,16 @@ def should_match_eligibility(user_preferences: Dict[str, Any], job: Job) -> bool
     return True
 
 
+@lru_cache(maxsize=8192)
+def _title_seniority(title_lower: str) -> Optional[str]:
+    """Seniority implied by keywords in a lowercased title, or None (memoized: titles repeat across postings)"""
+    if _JUNIOR_TITLE_PATTERN.search(title_lower):
+        return "junior"
+    if _SENIOR_TITLE_PATTERN.search(title_lower):
+        return "senior"
+    return None
+
+
 def detect_job_seniority(job_title: str, experience_min: Optional[int] = None) -> str:
     """
     Detect job seniority level from title and experience requirements.
@@ -414,16 +505,10 @@ def detect_job_seniority(job_title: str, experience_min: Optional[int] = None) -
     Returns:
         "junior", "mid", or "senior"
     """
-    title_lower = job_title.lower()
-
-    junior_keywords = ["junior", "jr", "entry", "associate", "graduate", "intern", "trainee"]
-    senior_keywords = ["senior", "sr", "lead", "principal", "staff", "head", "director", "vp", "chief"]
-
     # Check title keywords first (most reliable)
-    if any(kw in title_lower for kw in junior_keywords):
-        return "junior"
-    if any(kw in title_lower for kw in senior_keywords):
-        return "senior"
+    title_seniority = _title_seniority(job_title.lower())
+    if title_seniority:
+        return title_seniority
 
     # Fall back to experience requirements
     if experience_min is not None:
@@ -515,14 +600,17 @@ def calculate_location_match(user_preferences: Dict[str, Any], job: Job) -> floa
     if not preferred_countries:
         return 100.0
 
-    job_location = (job.location or "").lower()
+    # Blank entries are dropped: "" would be a substring of every location
+    preferred = {key for country in preferred_countries if (key := country.strip().casefold())}
 
-    # Check if "remote" is in preferences - matches any remote job
-    if "remote" in [c.lower() for c in preferred_countries] and job.remote_type == "full":
+    # Check if "remote" is in preferences - matches any remote job (no location parsing needed)
+    if "remote" in preferred and job.remote_type == "full":
         return 100.0
 
-    # Check if job location contains any preferred country
-    if any(country.lower() in job_location for country in preferred_countries):
+    job_location = (job.location or "").casefold()
+
+    # Substring search also covers free-form locations ("Remote - Germany")
+    if any(country in job_location for country in preferred):
         return 100.0
 
     # Location mismatch
@@ -550,12 +638,14 @@ def calculate_salary_match(user_preferences: Dict[str, Any], job: Job) -> float:
     job_max = job.salary_max or job.salary_min
     if job_max and job_max >= min_salary:
         return 100.0
-    elif job.salary_min and job.salary_min >= min_salary * 0.9:
-        return 80.0  # Close to minimum
-    elif job.salary_min and job.salary_min >= min_salary * 0.8:
-        return 60.0  # Somewhat close
-    else:
-        return 30.0  # Below expectations
+
+    # Otherwise score by how close the job's minimum gets to the user's minimum
+    if job.salary_min:
+        for fraction, score in SALARY_MATCH_BANDS:
+            if job.salary_min >= min_salary * fraction:
+                return score
+
+    return 30.0  # Below expectations
 
 
 def calculate_experience_match(user: User, job_requirements: Dict[str, Any]) -> float:
@@ -577,12 +667,10 @@ def calculate_experience_match(user: User, job_requirements: Dict[str, Any]) ->
     if min_years and user_years < min_years:
         # User is under-experienced
         gap = min_years - user_years
-        if gap <= 1:
-            return 80.0  # Close enough
-        elif gap <= 2:
-            return 60.0
-        else:
-            return 40.0
+        for max_gap, score in EXPERIENCE_GAP_BANDS:
+            if gap <= max_gap:
+                return score
+        return 40.0
     elif max_years and user_years > max_years:
         # User is over-experienced
         return 90.0  # Slightly penalize overqualification
@@ -618,31 +706,24 @@ def calculate_title_match(user: User, job: Job) -> float:
     if not target_roles:
         return 50.0
 
-    # 4. Extract keywords from target roles and job title
-    # Common tech role keywords
-    engineer_keywords = ["engineer", "developer", "programmer", "software", "backend", "frontend", "fullstack", "full-stack", "sde"]
-    senior_keywords = ["senior", "sr", "lead", "principal", "staff"]
-    manager_keywords = ["manager", "director", "head", "chief", "vp", "cto", "ceo"]
-    designer_keywords = ["designer", "ux", "ui", "product design"]
-    data_keywords = ["data", "analyst", "scientist", "ml", "machine learning", "ai"]
-    devops_keywords = ["devops", "sre", "infrastructure", "platform", "cloud"]
-
-    # Normalize target roles
-    target_roles_lower = [role.lower() for role in target_roles]
-    target_roles_text = " ".join(target_roles_lower)
-
-    # 5. Check for role category match
-    user_is_engineer = any(kw in target_roles_text for kw in engineer_keywords)
-    user_is_manager = any(kw in target_roles_text for kw in manager_keywords)
-    user_is_designer = any(kw in target_roles_text for kw in designer_keywords)
-    user_is_data = any(kw in target_roles_text for kw in data_keywords)
-    user_is_devops = any(kw in target_roles_text for kw in devops_keywords)
-
-    job_is_engineer = any(kw in job_title_lower for kw in engineer_keywords)
-    job_is_manager = any(kw in job_title_lower for kw in manager_keywords)
-    job_is_designer = any(kw in job_title_lower for kw in designer_keywords)
-    job_is_data = any(kw in job_title_lower for kw in data_keywords)
-    job_is_devops = any(kw in job_title_lower for kw in devops_keywords)
+    # 4. Normalize target roles (one lowercase pass over the joined text)
+    target_roles_text = " ".join(target_roles).lower()
+
+    # 5. Classify both sides into role families once
+    user_roles = _title_roles(target_roles_text)
+    job_roles = _title_roles(job_title_lower)
+
+    user_is_engineer = "engineer" in user_roles
+    user_is_manager = "manager" in user_roles
+    user_is_designer = "designer" in user_roles
+    user_is_data = "data" in user_roles
+    user_is_devops = "devops" in user_roles
+
+    job_is_engineer = "engineer" in job_roles
+    job_is_manager = "manager" in job_roles
+    job_is_designer = "designer" in job_roles
+    job_is_data = "data" in job_roles
+    job_is_devops = "devops" in job_roles
 
     # 6. Calculate score based on role category alignment
     score = 0.0
@@ -680,8 +761,8 @@ def calculate_title_match(user: User, job: Job) -> float:
             score = 20.0  # No clear match
 
     # 7. Seniority alignment bonus/penalty
-    user_is_senior = any(kw in target_roles_text for kw in senior_keywords)
-    job_is_senior = any(kw in job_title_lower for kw in senior_keywords)
+    user_is_senior = "senior" in user_roles
+    job_is_senior = "senior" in job_roles
 
     if user_is_senior and job_is_senior:
         score = min(100.0, score + 10.0)  # Bonus for seniority match
@@ -691,10 +772,61 @@ def calculate_title_match(user: User, job: Job) -> float:
     return round(score, 2)
 
 
+def calculate_partial_scores(user: User, job: Job) -> Dict[str, float]:
+    """
+    Scores that don't depend on the job's extracted requirements.
+
+    Returns:
+        Dict of title, location, salary and freshness scores (0-100),
+        keyed like MATCH_SCORE_WEIGHTS
+    """
+    user_prefs = user.preferences or {}
+    return {
+        "title": calculate_title_match(user, job),
+        "location": calculate_location_match(user_prefs, job),
+        "salary": calculate_salary_match(user_prefs, job),
+        "freshness": calculate_freshness_score(job),
+    }
+
+
+def calculate_match_score_ceiling(
+    user: User,
+    job: Job,
+    partial_scores: Optional[Dict[str, float]] = None
+) -> float:
+    """
+    Upper bound on calculate_match_score before the job's requirements are extracted.
+
+    Title, location, salary and freshness only need the user and job; the
+    requirement-based skill and experience scores are assumed to be 100.
+
+    Args:
+        user: User object
+        job: Job object
+        partial_scores: Precomputed calculate_partial_scores result (computed if omitted)
+
+    Returns:
+        Rounded score 0-100 that calculate_match_score can never exceed
+    """
+    if partial_scores is None:
+        partial_scores = calculate_partial_scores(user, job)
+    weights = MATCH_SCORE_WEIGHTS
+
+    ceiling = (
+        100.0 * (weights["skills"] + weights["experience"]) +
+        partial_scores["title"] * weights["title"] +
+        partial_scores["location"] * weights["location"] +
+        partial_scores["salary"] * weights["salary"] +
+        partial_scores["freshness"] * weights["freshness"]
+    )
+    return round(ceiling, 2)
+
+
 def calculate_match_score(
     user: User,
     job: Job,
-    job_requirements: Dict[str, Any]
+    job_requirements: Dict[str, Any],
+    partial_scores: Optional[Dict[str, float]] = None
 ) -> Tuple[float, Dict[str, Any]]:
     """
     Calculate overall match score between user and job
@@ -703,6 +835,7 @@ def calculate_match_score(
         user: User object with skills and preferences
         job: Job object
         job_requirements: Extracted job requirements from LLM
+        partial_scores: Precomputed calculate_partial_scores result (computed if omitted)
 
     Returns:
         Tuple of (overall_score, detailed_analysis)
@@ -710,26 +843,19 @@ def calculate_match_score(
         - detailed_analysis: Breakdown of scores by category
     """
     user_skills = user.skills or []
-    user_prefs = user.preferences or {}
+    if partial_scores is None:
+        partial_scores = calculate_partial_scores(user, job)
 
     # Calculate individual scores
     skill_score, matching_skills, missing_skills, related_skills = calculate_skill_match(user_skills, job_requirements)
-    title_score = calculate_title_match(user, job)
-    location_score = calculate_location_match(user_prefs, job)
-    salary_score = calculate_salary_match(user_prefs, job)
+    title_score = partial_scores["title"]
+    location_score = partial_scores["location"]
+    salary_score = partial_scores["salary"]
     experience_score = calculate_experience_match(user, job_requirements)
-    freshness_score = calculate_freshness_score(job)
-
-    # Weighted average (total = 100%)
-    # Freshness added to encourage applying to recent jobs
-    weights = {
-        "skills": 0.35,          # 35% (reduced from 40% to add freshness)
-        "title": 0.20,           # 20% (prevents "Director" for ICs)
-        "location": 0.10,        # 10%
-        "salary": 0.10,          # 10%
-        "experience": 0.15,      # 15% (reduced from 20% to add freshness)
-        "freshness": 0.10,       # 10% (NEW - encourages recent jobs)
-    }
+    freshness_score = partial_scores["freshness"]
+
+    # Weighted average
+    weights = MATCH_SCORE_WEIGHTS
 
     overall_score = (
         skill_score * weights["skills"] +
@@ -751,7 +877,7 @@ def calculate_match_score(
         "matching_skills": matching_skills,
         "missing_skills": missing_skills,
         "related_skills": related_skills,
-        "weights": weights,
+        "weights": dict(weights),
     }
 
     return round(overall_score, 2), analysis
@@ -761,7 +887,8 @@ async def create_match_for_job(
     db: Session,
     user: User,
     job: Job,
-    min_score: float = 60.0
+    min_score: float = 60.0,
+    requirements_cache: Optional[Dict[int, Optional[Dict[str, Any]]]] = None
 ) -> Optional[Match]:
     """
     Create or update a match between user and job
@@ -771,6 +898,8 @@ async def create_match_for_job(
         user: User object
         job: Job object
         min_score: Minimum score threshold to create match (default 60)
+        requirements_cache: Extracted requirements by job ID, shared across calls so the
+            LLM runs at most once per job (filled on the first extraction)
 
     Returns:
         Match object if score >= min_score, None otherwise
@@ -799,12 +928,24 @@ async def create_match_for_job(
             logger.info(f"Job {job.id} doesn't match user {user.id} eligibility requirements")
             return None
 
-        # Extract job requirements using LLM
-        job_requirements = extract_job_requirements(
-            job_title=job.title,
-            job_company=job.company,
-            job_description=job.description
-        )
+        # Skip the LLM call when even perfect skill/experience scores can't reach min_score
+        partial_scores = calculate_partial_scores(user, job)
+        ceiling = calculate_match_score_ceiling(user, job, partial_scores)
+        if ceiling < min_score:
+            logger.info(f"Job {job.id} score ceiling {ceiling} below threshold {min_score} for user {user.id}")
+            return None
+
+        # Extract job requirements using LLM (unless an earlier call already did)
+        if requirements_cache is not None and job.id in requirements_cache:
+            job_requirements = requirements_cache[job.id]
+        else:
+            job_requirements = extract_job_requirements(
+                job_title=job.title,
+                job_company=job.company,
+                job_description=job.description
+            )
+            if requirements_cache is not None:
+                requirements_cache[job.id] = job_requirements
 
         if not job_requirements:
             logger.warning(f"Failed to extract requirements for job {job.id}")
@@ -849,7 +990,7 @@ async def create_match_for_job(
             return None
 
         # Calculate match score
-        score, analysis = calculate_match_score(user, job, job_requirements)
+        score, analysis = calculate_match_score(user, job, job_requirements, partial_scores)
 
         # Only create match if score meets threshold
         if score < min_score:
@@ -958,9 +1099,12 @@ async def match_job_with_all_users(
         User.cv_text.isnot(None)
     ).all()
 
+    # Requirements depend only on the job: extracted by the first user that passes
+    # the pre-LLM filters, then reused for the rest
+    requirements_cache: Dict[int, Optional[Dict[str, Any]]] = {}
     matches = []
     for user in users:
-        match = await create_match_for_job(db, user, job, min_score)
+        match = await create_match_for_job(db, user, job, min_score, requirements_cache=requirements_cache)
         if match:
             matches.append(match)
 
@@ -76,7 +76,7 @@ def extract_text_from_txt(file_content: bytes) -> str:
         Exception: If text decoding fails
     """
     try:
-        # Try UTF-8 first, fall back to latin-1
+        # Try UTF-8 first, fall back to latin-1 (maps every byte, never fails)
         try:
             return file_content.decode('utf-8')
         except UnicodeDecodeError:
@@ -3,6 +3,7 @@ Skill normalization utilities.
 
 Maps common skill variations to canonical names for consistent matching.
 """
+from functools import lru_cache
 
 # Mapping of lowercase variations -> canonical display name
 SKILL_ALIASES = {
@@ -190,11 +191,20 @@ SKILL_ALIASES = {
     "new relic": "New Relic",
 }
 
+# Lookup table built once at import: casefolded alias or canonical name -> canonical name.
+# Canonical names are included so a new canonical value resolves even without its own alias entry.
+_ALIAS_LOOKUP = {canonical.casefold(): canonical for canonical in SKILL_ALIASES.values()}
+_ALIAS_LOOKUP.update((alias.casefold(), canonical) for alias, canonical in SKILL_ALIASES.items())
 
+
+@lru_cache(maxsize=4096)
 def normalize_skill(skill: str) -> str:
     """
     Normalize a skill name for comparison.
 
+    Memoized: the same skill strings recur across every job scored, and the
+    result depends only on the import-time _ALIAS_LOOKUP table.
+
     - Strips whitespace
     - Looks up canonical name from aliases
     - Returns canonical name if found, otherwise returns original with preserved case
@@ -205,10 +215,9 @@ def normalize_skill(skill: str) -> str:
         normalize_skill("Some Unknown Skill") -> "Some Unknown Skill"
     """
     stripped = skill.strip()
-    lookup_key = stripped.lower()
 
     # Return canonical name if found in aliases, otherwise return original
-    return SKILL_ALIASES.get(lookup_key, stripped)
+    return _ALIAS_LOOKUP.get(stripped.casefold(), stripped)
 
 
 def get_canonical_skill(skill: str) -> str:
@@ -4,7 +4,7 @@ Skill clusters for semantic skill matching.
 Skills in the same cluster are considered related, allowing partial credit
 when a user has related but not exact skills.
 """
-from typing import Set
+from typing import Dict, FrozenSet, Set, Tuple
 from app.utils.skill_aliases import normalize_skill
 
 
@@ -75,7 +75,33 @@ SKILL_CLUSTERS = {
 }
 
 
-def get_skill_clusters(skill: str) -> Set[str]:
+def _build_cluster_indexes() -> Tuple[Dict[str, FrozenSet[str]], Dict[str, FrozenSet[str]]]:
+    """Invert SKILL_CLUSTERS into skill -> cluster names and skill -> other skills in those clusters"""
+    clusters_of: Dict[str, Set[str]] = {}
+    related_of: Dict[str, Set[str]] = {}
+    for cluster_name, skills in SKILL_CLUSTERS.items():
+        for skill in skills:
+            key = skill.casefold()
+            clusters_of.setdefault(key, set()).add(cluster_name)
+            related_of.setdefault(key, set()).update(s for s in skills if s.casefold() != key)
+    return (
+        {key: frozenset(names) for key, names in clusters_of.items()},
+        {key: frozenset(related) for key, related in related_of.items()},
+    )
+
+
+# Inverted indexes built once at import, keyed by casefolded canonical skill name
+# (values keep the canonical display names)
+SKILL_TO_CLUSTERS, RELATED_SKILLS = _build_cluster_indexes()
+_NO_SKILLS: FrozenSet[str] = frozenset()
+
+
+def _skill_key(skill: str) -> str:
+    """Casefolded canonical name: the key exact matches and the cluster indexes compare"""
+    return normalize_skill(skill).casefold()
+
+
+def get_skill_clusters(skill: str) -> FrozenSet[str]:
     """
     Get all cluster names that contain the given skill.
 
@@ -85,17 +111,10 @@ def get_skill_clusters(skill: str) -> Set[str]:
     Returns:
         Set of cluster names containing this skill
     """
-    normalized = normalize_skill(skill)
-    clusters = set()
+    return SKILL_TO_CLUSTERS.get(_skill_key(skill), _NO_SKILLS)
 
-    for cluster_name, skills in SKILL_CLUSTERS.items():
-        if normalized in skills:
-            clusters.add(cluster_name)
 
-    return clusters
-
-
-def get_related_skills(skill: str) -> Set[str]:
+def get_related_skills(skill: str) -> FrozenSet[str]:
     """
     Get all skills related to the given skill (in same clusters).
 
@@ -105,17 +124,7 @@ def get_related_skills(skill: str) -> Set[str]:
     Returns:
         Set of related skill names (excluding the input skill)
     """
-    normalized = normalize_skill(skill)
-    related = set()
-
-    for cluster_name, skills in SKILL_CLUSTERS.items():
-        if normalized in skills:
-            related.update(skills)
-
-    # Remove the original skill
-    related.discard(normalized)
-
-    return related
+    return RELATED_SKILLS.get(_skill_key(skill), _NO_SKILLS)
 
 
 def are_skills_related(skill1: str, skill2: str) -> bool:
@@ -129,16 +138,13 @@ def are_skills_related(skill1: str, skill2: str) -> bool:
     Returns:
         True if skills share at least one cluster
     """
-    norm1 = normalize_skill(skill1)
-    norm2 = normalize_skill(skill2)
+    key1 = _skill_key(skill1)
+    key2 = _skill_key(skill2)
 
-    if norm1 == norm2:
+    if key1 == key2:
         return True
 
-    clusters1 = get_skill_clusters(norm1)
-    clusters2 = get_skill_clusters(norm2)
-
-    return bool(clusters1 & clusters2)
+    return not SKILL_TO_CLUSTERS.get(key1, _NO_SKILLS).isdisjoint(SKILL_TO_CLUSTERS.get(key2, _NO_SKILLS))
 
 
 def calculate_skill_similarity(user_skill: str, required_skill: str) -> float:
@@ -152,15 +158,15 @@ def calculate_skill_similarity(user_skill: str, required_skill: str) -> float:
     Returns:
         Score: 1.0 = exact match, 0.5 = related (same cluster), 0.0 = unrelated
     """
-    user_norm = normalize_skill(user_skill)
-    required_norm = normalize_skill(required_skill)
+    user_key = _skill_key(user_skill)
+    required_key = _skill_key(required_skill)
 
-    # Exact match
-    if user_norm == required_norm:
+    # Exact match (case-insensitive, like calculate_skill_match)
+    if user_key == required_key:
         return 1.0
 
     # Check if related
-    if are_skills_related(user_norm, required_norm):
+    if not SKILL_TO_CLUSTERS.get(user_key, _NO_SKILLS).isdisjoint(SKILL_TO_CLUSTERS.get(required_key, _NO_SKILLS)):
         return 0.5
 
     return 0.0
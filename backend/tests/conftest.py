@@ -209,7 +209,7 @@ def test_user(db_session: Session):
     return user
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_cv_text():
     """Sample CV text for testing"""
     return """
@@ -2,8 +2,29 @@
 Unit tests for database module
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
+from sqlalchemy import create_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.database import SessionLocal, engine, get_db, get_db_session, init_db
+from app.models import Base
+
+
+@pytest.fixture(scope="module", autouse=True)
+def in_memory_session_factory():
+    """Bind SessionLocal to in-memory SQLite so sessions never touch the real database"""
+    test_engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SessionLocal.configure(bind=test_engine)
+    try:
+        yield SessionLocal
+    finally:
+        SessionLocal.configure(bind=engine)
+        test_engine.dispose()
 
 
 class TestGetDb:
@@ -11,8 +32,6 @@ class TestGetDb:
 
     def test_get_db_yields_session(self):
         """Test that get_db yields a database session"""
-        from app.database import get_db
-
         # Get the generator
         gen = get_db()
 
@@ -27,8 +46,6 @@ class TestGetDb:
 
     def test_get_db_full_lifecycle(self):
         """Test the full lifecycle of get_db"""
-        from app.database import get_db
-
         sessions = []
         for session in get_db():
             sessions.append(session)
@@ -43,16 +60,12 @@ class TestGetDbSession:
 
     def test_get_db_session_yields_session(self):
         """Test that get_db_session yields a database session"""
-        from app.database import get_db_session
-
         with get_db_session() as session:
             assert session is not None
             assert isinstance(session, Session)
 
     def test_get_db_session_commits_on_success(self):
         """Test that context manager completes without error"""
-        from app.database import get_db_session
-
         # This should complete without raising
         with get_db_session() as session:
             # Just verify we can use the session
@@ -60,8 +73,6 @@ class TestGetDbSession:
 
     def test_get_db_session_rollbacks_on_exception(self):
         """Test that get_db_session rolls back on exception"""
-        from app.database import get_db_session
-
         with pytest.raises(ValueError):
             with get_db_session() as session:
                 raise ValueError("Test error")
@@ -74,9 +85,6 @@ class TestInitDb:
 
     def test_init_db_creates_tables(self):
         """Test that init_db creates database tables"""
-        from app.database import init_db, engine
-        from app.models import Base
-
         with patch.object(Base.metadata, 'create_all') as mock_create_all:
             init_db()
 
@@ -3,14 +3,60 @@ Unit tests for generation service
 """
 import pytest
 from unittest.mock import patch, MagicMock
-from datetime import datetime
-import json
+from collections import namedtuple
+from datetime import datetime, timezone
 
 from app.services.generation import (
     generate_cover_letter,
     generate_cv_highlights,
 )
 
+_Block = namedtuple("Block", "text")
+_Msg = namedtuple("Msg", "content")
+
+_FROZEN_NOW = datetime(2025, 1, 1, 12, 0, tzinfo=timezone.utc)
+_COVER_LETTER_TEXT = "Dear Hiring Manager,\n\nI am writing..."
+_HIGHLIGHTS_JSON = '["Led backend team of 5 engineers", "Developed REST APIs"]'
+
+
+@pytest.fixture(autouse=True)
+def frozen_now():
+    """Freeze datetime.now() in the generation service so generated_at is deterministic"""
+    with patch('app.services.generation.datetime') as mock_datetime:
+        mock_datetime.now.return_value = _FROZEN_NOW
+        yield _FROZEN_NOW
+
+
+@pytest.fixture(scope="session")
+def anthropic_factory():
+    """Factory for mock Anthropic clients returning the given text or raising the given error"""
+    def _make(text=None, exc=None):
+        client = MagicMock()
+        if exc:
+            client.messages.create.side_effect = exc
+        else:
+            client.messages.create.return_value = _Msg(content=[_Block(text=text)])
+        return client
+    return _make
+
+
+@pytest.fixture(scope="module")
+def cached_cover_letter():
+    """Cover letter payload as stored in Redis"""
+    return {
+        "cover_letter": "Dear Hiring Manager, I am excited...",
+        "generated_at": "2025-01-01T12:00:00"
+    }
+
+
+@pytest.fixture(scope="module")
+def cached_highlights():
+    """CV highlights payload as stored in Redis"""
+    return {
+        "highlights": ["Led backend team...", "Developed APIs..."],
+        "generated_at": "2025-01-01T12:00:00"
+    }
+
 
 @pytest.fixture
 def mock_user():
@@ -82,29 +128,23 @@ class TestGenerateCoverLetter:
 
             assert result is None
 
-    def test_generate_cover_letter_cache_hit(self, mock_user, mock_job, mock_match):
+    def test_generate_cover_letter_cache_hit(
+        self, mock_user, mock_job, mock_match, cached_cover_letter, monkeypatch
+    ):
         """Test when cover letter is in cache"""
-        cached_data = {
-            "cover_letter": "Dear Hiring Manager, I am excited...",
-            "generated_at": "2025-01-01T12:00:00"
-        }
+        monkeypatch.setattr('app.services.generation.client', MagicMock())
+        monkeypatch.setattr('app.services.generation.cache_get', lambda *a, **k: cached_cover_letter)
 
-        with patch('app.services.generation.client', MagicMock()):
-            with patch('app.services.generation.cache_get', return_value=cached_data):
-                result = generate_cover_letter(mock_user, mock_job, mock_match)
+        result = generate_cover_letter(mock_user, mock_job, mock_match)
 
-                assert result is not None
-                assert result["cached"] is True
-                assert result["cover_letter"] == cached_data["cover_letter"]
-                assert result["generated_at"] == cached_data["generated_at"]
+        assert result is not None
+        assert result["cached"] is True
+        assert result["cover_letter"] == cached_cover_letter["cover_letter"]
+        assert result["generated_at"] == cached_cover_letter["generated_at"]
 
-    def test_generate_cover_letter_cache_miss(self, mock_user, mock_job, mock_match):
+    def test_generate_cover_letter_cache_miss(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test when cover letter needs to be generated"""
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text="Dear Hiring Manager,\n\nI am writing...")]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=_COVER_LETTER_TEXT)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -114,12 +154,16 @@ class TestGenerateCoverLetter:
                     assert result is not None
                     assert result["cached"] is False
                     assert "Dear Hiring Manager" in result["cover_letter"]
+                    assert result["generated_at"] == _FROZEN_NOW.isoformat()
                     mock_cache_set.assert_called_once()
+                    assert mock_cache_set.call_args[0][1] == {
+                        "cover_letter": _COVER_LETTER_TEXT.strip(),
+                        "generated_at": _FROZEN_NOW.isoformat()
+                    }
 
-    def test_generate_cover_letter_api_error(self, mock_user, mock_job, mock_match):
+    def test_generate_cover_letter_api_error(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test when API call fails"""
-        mock_client = MagicMock()
-        mock_client.messages.create.side_effect = Exception("API Error")
+        mock_client = anthropic_factory(exc=Exception("API Error"))
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -127,7 +171,7 @@ class TestGenerateCoverLetter:
 
                 assert result is None
 
-    def test_generate_cover_letter_no_preferences(self, mock_job, mock_match):
+    def test_generate_cover_letter_no_preferences(self, mock_job, mock_match, anthropic_factory):
         """Test with user having no preferences"""
         user = MagicMock()
         user.id = 1
@@ -136,11 +180,7 @@ class TestGenerateCoverLetter:
         user.experience_years = 0
         user.preferences = None
 
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text="Dear Hiring Manager...")]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text="Dear Hiring Manager...")
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -150,17 +190,13 @@ class TestGenerateCoverLetter:
                     assert result is not None
                     assert result["cover_letter"] is not None
 
-    def test_generate_cover_letter_no_match_reasoning(self, mock_user, mock_job):
+    def test_generate_cover_letter_no_match_reasoning(self, mock_user, mock_job, anthropic_factory):
         """Test with match having no reasoning"""
         match = MagicMock()
         match.score = 75.0
         match.reasoning = None
 
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text="Dear Hiring Manager...")]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text="Dear Hiring Manager...")
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -180,29 +216,22 @@ class TestGenerateCvHighlights:
 
             assert result is None
 
-    def test_generate_cv_highlights_cache_hit(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_cache_hit(
+        self, mock_user, mock_job, mock_match, cached_highlights, monkeypatch
+    ):
         """Test when highlights are in cache"""
-        cached_data = {
-            "highlights": ["Led backend team...", "Developed APIs..."],
-            "generated_at": "2025-01-01T12:00:00"
-        }
+        monkeypatch.setattr('app.services.generation.client', MagicMock())
+        monkeypatch.setattr('app.services.generation.cache_get', lambda *a, **k: cached_highlights)
 
-        with patch('app.services.generation.client', MagicMock()):
-            with patch('app.services.generation.cache_get', return_value=cached_data):
-                result = generate_cv_highlights(mock_user, mock_job, mock_match)
+        result = generate_cv_highlights(mock_user, mock_job, mock_match)
 
-                assert result is not None
-                assert result["cached"] is True
-                assert result["highlights"] == cached_data["highlights"]
+        assert result is not None
+        assert result["cached"] is True
+        assert result["highlights"] == cached_highlights["highlights"]
 
-    def test_generate_cv_highlights_cache_miss(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_cache_miss(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test when highlights need to be generated"""
-        highlights_json = '["Led backend team of 5 engineers", "Developed REST APIs"]'
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=highlights_json)]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=_HIGHLIGHTS_JSON)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -212,16 +241,13 @@ class TestGenerateCvHighlights:
                     assert result is not None
                     assert result["cached"] is False
                     assert len(result["highlights"]) == 2
+                    assert result["generated_at"] == _FROZEN_NOW.isoformat()
                     mock_cache_set.assert_called_once()
 
-    def test_generate_cv_highlights_with_markdown_code_block(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_with_markdown_code_block(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test parsing JSON from markdown code block"""
         highlights_response = '```json\n["Highlight 1", "Highlight 2"]\n```'
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=highlights_response)]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=highlights_response)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -231,13 +257,9 @@ class TestGenerateCvHighlights:
                     assert result is not None
                     assert len(result["highlights"]) == 2
 
-    def test_generate_cv_highlights_json_parse_error(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_json_parse_error(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test handling of invalid JSON response"""
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text="This is not valid JSON")]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text="This is not valid JSON")
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -245,13 +267,9 @@ class TestGenerateCvHighlights:
 
                 assert result is None
 
-    def test_generate_cv_highlights_not_list_response(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_not_list_response(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test when response is valid JSON but not a list"""
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text='{"key": "value"}')]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text='{"key": "value"}')
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -259,10 +277,9 @@ class TestGenerateCvHighlights:
 
                 assert result is None
 
-    def test_generate_cv_highlights_api_error(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_api_error(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test when API call fails"""
-        mock_client = MagicMock()
-        mock_client.messages.create.side_effect = Exception("API Error")
+        mock_client = anthropic_factory(exc=Exception("API Error"))
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -270,7 +287,7 @@ class TestGenerateCvHighlights:
 
                 assert result is None
 
-    def test_generate_cv_highlights_no_preferences(self, mock_job, mock_match):
+    def test_generate_cv_highlights_no_preferences(self, mock_job, mock_match, anthropic_factory):
         """Test with user having no preferences"""
         user = MagicMock()
         user.id = 1
@@ -278,11 +295,7 @@ class TestGenerateCvHighlights:
         user.preferences = None
 
         highlights_json = '["Generic highlight 1", "Generic highlight 2"]'
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=highlights_json)]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=highlights_json)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -292,7 +305,7 @@ class TestGenerateCvHighlights:
                     assert result is not None
                     assert len(result["highlights"]) == 2
 
-    def test_generate_cv_highlights_no_job_description(self, mock_user, mock_match):
+    def test_generate_cv_highlights_no_job_description(self, mock_user, mock_match, anthropic_factory):
         """Test with job having no description"""
         job = MagicMock()
         job.id = 100
@@ -300,11 +313,7 @@ class TestGenerateCvHighlights:
         job.description = None
 
         highlights_json = '["Highlight"]'
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=highlights_json)]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=highlights_json)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
@@ -313,14 +322,10 @@ class TestGenerateCvHighlights:
 
                     assert result is not None
 
-    def test_generate_cv_highlights_code_block_with_json_prefix(self, mock_user, mock_job, mock_match):
+    def test_generate_cv_highlights_code_block_with_json_prefix(self, mock_user, mock_job, mock_match, anthropic_factory):
         """Test parsing JSON from code block with 'json' prefix on first line"""
         highlights_response = '```\njson\n["Highlight 1"]\n```'
-        mock_message = MagicMock()
-        mock_message.content = [MagicMock(text=highlights_response)]
-
-        mock_client = MagicMock()
-        mock_client.messages.create.return_value = mock_message
+        mock_client = anthropic_factory(text=highlights_response)
 
         with patch('app.services.generation.client', mock_client):
             with patch('app.services.generation.cache_get', return_value=None):
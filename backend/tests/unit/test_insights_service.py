@@ -2,9 +2,11 @@
 Unit tests for insights service
 """
 import pytest
-from unittest.mock import MagicMock, patch
-from datetime import datetime
+from unittest.mock import DEFAULT, MagicMock, Mock, patch
+from types import MappingProxyType, SimpleNamespace
+from sqlalchemy.orm import Session
 
+from app.services import insights as _insights
 from app.services.insights import (
     analyze_market_skills,
     identify_skill_gaps,
@@ -13,412 +15,359 @@ from app.services.insights import (
     create_or_update_skill_analysis,
     run_skill_analysis_for_user,
 )
+from app.models import SkillAnalysis
+
+# extract_job_requirements results shared across tests
+_PY_FASTAPI = {"required_skills": ["Python", "FastAPI"], "nice_to_have_skills": ["Docker"]}
+_PY_DJANGO = {"required_skills": ["Python", "Django"], "nice_to_have_skills": []}
+_EXTRACT_FIXTURES = (_PY_FASTAPI, _PY_DJANGO)
+
+
+def _frozen_market(market_skills):
+    """Read-only market_skills mapping, shared safely across tests"""
+    return MappingProxyType({skill: MappingProxyType(data) for skill, data in market_skills.items()})
+
+
+class QueryStub:
+    """Chainable stand-in for a SQLAlchemy Query returning canned results"""
+    __slots__ = ("_all", "_first", "_scalar", "limit_value")
+
+    def __init__(self, all=(), first=None, scalar=None):
+        self._all = list(all)
+        self._first = first
+        self._scalar = scalar
+        self.limit_value = None
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def filter(self, *args, **kwargs):
+        return self
+
+    def limit(self, value):
+        self.limit_value = value
+        return self
+
+    def all(self):
+        return self._all
+
+    def first(self):
+        return self._first
+
+    def scalar(self):
+        return self._scalar
+
+
+@pytest.fixture(scope="module")
+def db_query_factory():
+    """Factory for (mock_db, query_stub) pairs where db.query() returns query_stub"""
+    def _make(jobs=(), first=None, scalar=None):
+        query = QueryStub(all=jobs, first=first, scalar=scalar)
+
+        # MagicMock kept only for add/commit/refresh call assertions
+        mock_db = MagicMock(spec=Session)
+        mock_db.query = lambda *args: query
+        return mock_db, query
+    return _make
+
+
+@pytest.fixture
+def make_job():
+    """Factory for lightweight jobs exposing only the attributes analyze_market_skills reads"""
+    def _make(**overrides):
+        return SimpleNamespace(**{
+            "title": "Developer",
+            "company": "Company",
+            "description": "Description",
+            "salary_max": None,
+            **overrides,
+        })
+    return _make
+
+
+@pytest.fixture
+def mock_db_query(db_query_factory):
+    """Fresh (mock_db, query_stub) pair with no jobs, for tests that need no canned results"""
+    return db_query_factory()
 
 
 class TestAnalyzeMarketSkills:
     """Test market skill analysis"""
 
-    def test_analyze_market_skills_no_jobs(self):
+    @pytest.fixture(autouse=True)
+    def _patch_extract(self):
+        """Patch extract_job_requirements for every test; tests configure self.mock_extract"""
+        with patch.object(_insights, 'extract_job_requirements') as mock_extract:
+            self.mock_extract = mock_extract
+            yield
+
+    def test_analyze_market_skills_no_jobs(self, mock_db_query):
         """Test when no jobs exist"""
-        mock_db = MagicMock()
-        mock_query = MagicMock()
-        mock_query.order_by.return_value.all.return_value = []
-        mock_db.query.return_value = mock_query
+        mock_db, _ = mock_db_query
 
         result = analyze_market_skills(mock_db)
 
         assert result == {}
 
-    def test_analyze_market_skills_with_limit(self):
+    def test_analyze_market_skills_with_limit(self, mock_db_query):
         """Test with job limit"""
-        mock_db = MagicMock()
-        mock_query = MagicMock()
-        mock_query.order_by.return_value.limit.return_value.all.return_value = []
-        mock_db.query.return_value = mock_query
+        mock_db, mock_query = mock_db_query
 
         result = analyze_market_skills(mock_db, limit=10)
 
-        mock_query.order_by.return_value.limit.assert_called_with(10)
+        assert mock_query.limit_value == 10
 
-    @patch('app.services.insights.extract_job_requirements')
-    def test_analyze_market_skills_with_jobs(self, mock_extract):
+    def test_analyze_market_skills_with_jobs(self, db_query_factory, make_job):
         """Test skill extraction and aggregation"""
-        mock_db = MagicMock()
-        mock_query = MagicMock()
-
         # Create mock jobs
-        mock_job1 = MagicMock()
-        mock_job1.title = "Software Engineer"
-        mock_job1.company = "Tech Corp"
-        mock_job1.description = "Python developer needed"
-        mock_job1.salary_max = 150000
-
-        mock_job2 = MagicMock()
-        mock_job2.title = "Backend Developer"
-        mock_job2.company = "Web Inc"
-        mock_job2.description = "Python and Django"
-        mock_job2.salary_max = 120000
+        mock_job1 = make_job(
+            title="Software Engineer", company="Tech Corp",
+            description="Python developer needed", salary_max=150000
+        )
+        mock_job2 = make_job(
+            title="Backend Developer", company="Web Inc",
+            description="Python and Django", salary_max=120000
+        )
 
-        mock_query.order_by.return_value.all.return_value = [mock_job1, mock_job2]
-        mock_db.query.return_value = mock_query
+        mock_db, _ = db_query_factory([mock_job1, mock_job2])
 
         # Mock skill extraction
-        mock_extract.side_effect = [
-            {"required_skills": ["Python", "FastAPI"], "nice_to_have_skills": ["Docker"]},
-            {"required_skills": ["Python", "Django"], "nice_to_have_skills": []},
-        ]
+        self.mock_extract.side_effect = _EXTRACT_FIXTURES
 
         result = analyze_market_skills(mock_db)
 
         # Skills are stored with canonical names (proper casing)
-        assert "Python" in result
-        assert result["Python"]["count"] == 2
-        assert result["Python"]["frequency"] == 100.0
-        assert result["Python"]["avg_salary"] == 135000.0  # (150000 + 120000) / 2
-
-    @patch('app.services.insights.extract_job_requirements')
-    def test_analyze_market_skills_no_requirements(self, mock_extract):
+        python = result["Python"]
+        assert python.items() >= {
+            "count": 2,
+            "frequency": 100.0,
+            "avg_salary": 135000.0,  # (150000 + 120000) / 2
+        }.items()
+
+    def test_analyze_market_skills_no_requirements(self, db_query_factory, make_job):
         """Test when job requirements extraction returns None"""
-        mock_db = MagicMock()
-        mock_query = MagicMock()
-
-        mock_job = MagicMock()
-        mock_job.title = "Test Job"
-        mock_job.company = "Test Co"
-        mock_job.description = "Test"
-        mock_job.salary_max = None
+        mock_job = make_job(title="Test Job", company="Test Co", description="Test")
 
-        mock_query.order_by.return_value.all.return_value = [mock_job]
-        mock_db.query.return_value = mock_query
+        mock_db, _ = db_query_factory([mock_job])
 
-        mock_extract.return_value = None
+        self.mock_extract.return_value = None
 
         result = analyze_market_skills(mock_db)
 
         # Should return empty since no skills were extracted
         assert result == {}
 
-    @patch('app.services.insights.extract_job_requirements')
-    def test_analyze_market_skills_without_salary(self, mock_extract):
+    def test_analyze_market_skills_without_salary(self, db_query_factory, make_job):
         """Test skill analysis when jobs have no salary data"""
-        mock_db = MagicMock()
-        mock_query = MagicMock()
+        mock_job = make_job()  # defaults: no salary
 
-        mock_job = MagicMock()
-        mock_job.title = "Developer"
-        mock_job.company = "Company"
-        mock_job.description = "Description"
-        mock_job.salary_max = None
+        mock_db, _ = db_query_factory([mock_job])
 
-        mock_query.order_by.return_value.all.return_value = [mock_job]
-        mock_db.query.return_value = mock_query
-
-        mock_extract.return_value = {"required_skills": ["Python"], "nice_to_have_skills": []}
+        self.mock_extract.return_value = {"required_skills": ["Python"], "nice_to_have_skills": []}
 
         result = analyze_market_skills(mock_db)
 
         # Skills are stored with canonical names
-        assert "Python" in result
-        assert result["Python"]["avg_salary"] is None
-        assert result["Python"]["jobs_with_salary"] == 0
+        assert result["Python"].items() >= {"avg_salary": None, "jobs_with_salary": 0}.items()
+
+
+# Reference market (canonical names, as returned by analyze_market_skills); gap cases
+# take subsets of it and add their own outliers
+_BASE_MARKET = _frozen_market({
+    "Python": {"frequency": 50.0, "avg_salary": 150000},
+    "Django": {"frequency": 30.0},
+    "React": {"frequency": 25.0},
+    "Kubernetes": {"frequency": 15.0},
+    "Docker": {"frequency": 8.0},
+})
+
+
+def _market(*skills, **extra):
+    """Frozen subset of _BASE_MARKET plus any extra skill entries"""
+    return _frozen_market({**{skill: _BASE_MARKET[skill] for skill in skills}, **extra})
+
+
+_MARKET_PY_DJANGO_REACT = _market("Python", "Django", "React")
+_MARKET_PY_DJANGO_K8S = _market("Python", "Django", "Kubernetes")
+_MARKET_PY_OBSCURE = _market("Python", obscure_framework={"frequency": 2.0})  # Below 5% default
+_MARKET_PY_DOCKER_RARE = _market("Python", "Docker", rare_skill={"frequency": 3.0})
+_MARKET_PY_DJANGO = _market("Python", "Django")
+
+
+# (user_skills, market_skills, min_frequency, expected gaps, gaps that must not appear)
+SKILL_GAP_CASES = (
+    pytest.param(
+        ["Python", "Django", "React"], _MARKET_PY_DJANGO_REACT, 5.0, [], [],
+        id="no_gaps",
+    ),
+    pytest.param(
+        ["Python"], _MARKET_PY_DJANGO_K8S, 5.0, ["Django", "Kubernetes"], ["Python"],
+        id="with_gaps",
+    ),
+    pytest.param(
+        # obscure_framework is below the 5% default
+        [], _MARKET_PY_OBSCURE, 5.0, ["Python"], ["obscure_framework"],
+        id="below_min_frequency",
+    ),
+    pytest.param(
+        # Docker (8%) and rare_skill (3%) are below the custom 10% threshold
+        [], _MARKET_PY_DOCKER_RARE, 10.0, ["Python"], ["Docker", "rare_skill"],
+        id="custom_min_frequency",
+    ),
+    pytest.param(
+        # User's "python" normalizes to "Python" which matches the canonical market key
+        ["python", "django"], _MARKET_PY_DJANGO_REACT, 5.0, ["React"], ["Python", "Django"],
+        id="case_insensitive",
+    ),
+    pytest.param(
+        ["  Python  ", "\tDjango\n"], _MARKET_PY_DJANGO, 5.0, [], [],
+        id="with_whitespace",
+    ),
+)
 
 
 class TestIdentifySkillGaps:
     """Test skill gap identification"""
 
-    def test_identify_skill_gaps_no_gaps(self):
-        """Test when user has all required skills"""
-        user_skills = ["Python", "Django", "React"]
-        # Market skills use canonical names (as returned by analyze_market_skills)
-        market_skills = {
-            "Python": {"frequency": 50.0},
-            "Django": {"frequency": 30.0},
-            "React": {"frequency": 25.0},
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills)
-
-        assert gaps == []
-
-    def test_identify_skill_gaps_with_gaps(self):
-        """Test when user is missing skills"""
-        user_skills = ["Python"]
-        market_skills = {
-            "Python": {"frequency": 50.0},
-            "Django": {"frequency": 30.0},
-            "Kubernetes": {"frequency": 15.0},
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills)
-
-        assert "Django" in gaps
-        assert "Kubernetes" in gaps
-        assert "Python" not in gaps
-
-    def test_identify_skill_gaps_below_min_frequency(self):
-        """Test that low-frequency skills are excluded"""
-        user_skills = []
-        market_skills = {
-            "Python": {"frequency": 50.0},
-            "obscure_framework": {"frequency": 2.0},  # Below 5% default
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills)
-
-        assert "Python" in gaps
-        assert "obscure_framework" not in gaps
-
-    def test_identify_skill_gaps_custom_min_frequency(self):
-        """Test with custom minimum frequency"""
-        user_skills = []
-        market_skills = {
-            "Python": {"frequency": 50.0},
-            "Docker": {"frequency": 8.0},
-            "rare_skill": {"frequency": 3.0},
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills, min_frequency=10.0)
-
-        assert "Python" in gaps
-        assert "Docker" not in gaps  # Below 10%
-        assert "rare_skill" not in gaps
-
-    def test_identify_skill_gaps_case_insensitive(self):
-        """Test case-insensitive skill matching via normalization"""
-        user_skills = ["python", "django"]  # lowercase input
-        market_skills = {
-            "Python": {"frequency": 50.0},  # canonical names
-            "Django": {"frequency": 30.0},
-            "React": {"frequency": 25.0},
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills)
-
-        # User's "python" normalizes to "Python" which matches market key
-        assert "Python" not in gaps
-        assert "Django" not in gaps
-        assert "React" in gaps
-
-    def test_identify_skill_gaps_with_whitespace(self):
-        """Test that whitespace is handled"""
-        user_skills = ["  Python  ", "\tDjango\n"]
-        market_skills = {
-            "Python": {"frequency": 50.0},  # canonical names
-            "Django": {"frequency": 30.0},
-        }
-
-        gaps = identify_skill_gaps(user_skills, market_skills)
-
-        assert gaps == []
+    @pytest.mark.parametrize("user_skills,market_skills,min_frequency,expected,forbidden", SKILL_GAP_CASES)
+    def test_identify_skill_gaps(self, user_skills, market_skills, min_frequency, expected, forbidden):
+        """Test gaps are in-demand market skills the user lacks, after normalization"""
+        gaps = identify_skill_gaps(user_skills, market_skills, min_frequency=min_frequency)
 
+        assert sorted(gaps) == sorted(expected)
+        assert not set(gaps) & set(forbidden)
 
-class TestGenerateSkillRecommendations:
-    """Test skill recommendation generation (profile-aware)"""
 
-    def test_generate_recommendations_no_user_skills(self):
-        """Test with user having no skills - returns empty list"""
-        mock_user = MagicMock()
-        mock_user.skills = []
+# Seven Python-related skills with descending frequency, more than the top_n case keeps
+_TOP_N_MARKET = _frozen_market({
+    skill: {"frequency": 20.0 - i, "avg_salary": None}
+    for i, skill in enumerate(("fastapi", "django", "postgresql", "redis", "docker", "aws", "celery"))
+})
+_TOP_N_GAPS = list(_TOP_N_MARKET)
 
-        market_skills = {"python": {"frequency": 50.0, "avg_salary": 150000}}
-        skill_gaps = ["python"]
 
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
+# Related skills the recommender suggests for a Python user beyond the market's own gaps
+_PY_RELATED_LOW = [
+    ("postgresql", "low"), ("redis", "low"), ("docker", "low"), ("aws", "low"),
+]
 
+# (user_skills, market_skills, skill_gaps, top_n, expected [(skill, priority), ...])
+# Python is in SKILL_PATHS; fastapi/django/celery are related to it, kubernetes is not
+RECOMMENDATION_CASES = (
+    pytest.param(
+        [], _frozen_market({"python": {"frequency": 50.0, "avg_salary": 150000}}), ["python"], 10,
         # Profile-aware: no user skills means no related skills to recommend
-        assert recommendations == []
-
-    def test_generate_recommendations_high_priority(self):
-        """Test high priority recommendation for skill related to user's skills"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]  # Python is in SKILL_PATHS
-
-        # FastAPI is related to Python in SKILL_PATHS and has high market demand
-        market_skills = {
-            "fastapi": {"frequency": 25.0, "avg_salary": 150000}
-        }
-        skill_gaps = ["fastapi"]
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
-
-        assert len(recommendations) >= 1
-        # Find the fastapi recommendation
-        fastapi_rec = next((r for r in recommendations if r["skill"].lower() == "fastapi"), None)
-        assert fastapi_rec is not None
-        assert fastapi_rec["priority"] == "high"
-
-    def test_generate_recommendations_medium_priority(self):
-        """Test medium priority recommendation"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]  # Python is in SKILL_PATHS
-
-        # Django is related to Python, with medium frequency
-        market_skills = {
-            "django": {"frequency": 12.0, "avg_salary": 120000}
-        }
-        skill_gaps = ["django"]
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
-
-        assert len(recommendations) >= 1
-        # Find the django recommendation
-        django_rec = next((r for r in recommendations if r["skill"].lower() == "django"), None)
-        assert django_rec is not None
-        assert django_rec["priority"] == "medium"
-
-    def test_generate_recommendations_low_priority(self):
-        """Test low priority recommendation for skill with low market demand"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]
-
-        # Celery is related to Python but has low frequency
-        market_skills = {
-            "celery": {"frequency": 3.0, "avg_salary": None}
-        }
-        skill_gaps = ["celery"]
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
-
-        assert len(recommendations) >= 1
-        celery_rec = next((r for r in recommendations if r["skill"].lower() == "celery"), None)
-        assert celery_rec is not None
-        assert celery_rec["priority"] == "low"
-        assert celery_rec["salary_impact"] is None
-
-    def test_generate_recommendations_sorted_by_priority(self):
-        """Test that recommendations are sorted by priority then frequency"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]  # Python has related skills in SKILL_PATHS
-
-        # Market skills for Python-related skills with different frequencies
-        market_skills = {
+        [],
+        id="no_user_skills",
+    ),
+    pytest.param(
+        ["Python"], _frozen_market({"fastapi": {"frequency": 25.0, "avg_salary": 150000}}), ["fastapi"], 10,
+        [("fastapi", "high"), ("django", "low"), *_PY_RELATED_LOW, ("celery", "low")],
+        id="high_priority",
+    ),
+    pytest.param(
+        ["Python"], _frozen_market({"django": {"frequency": 12.0, "avg_salary": 120000}}), ["django"], 10,
+        [("django", "medium"), ("fastapi", "low"), *_PY_RELATED_LOW, ("celery", "low")],
+        id="medium_priority",
+    ),
+    pytest.param(
+        ["Python"], _frozen_market({"celery": {"frequency": 3.0, "avg_salary": None}}), ["celery"], 10,
+        [("celery", "low"), ("fastapi", "low"), ("django", "low"), *_PY_RELATED_LOW],
+        id="low_priority",
+    ),
+    pytest.param(
+        ["Python"],
+        _frozen_market({
             "celery": {"frequency": 3.0, "avg_salary": None},       # low priority (< 5%)
             "fastapi": {"frequency": 25.0, "avg_salary": 150000},   # high priority (>= 15%)
             "django": {"frequency": 12.0, "avg_salary": 130000},    # medium priority (5-15%)
-        }
-        skill_gaps = ["celery", "fastapi", "django"]
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
-
-        assert len(recommendations) >= 3
-        assert recommendations[0]["priority"] == "high"
-        assert recommendations[1]["priority"] == "medium"
-        assert recommendations[2]["priority"] == "low"
-
-    def test_generate_recommendations_top_n(self):
-        """Test limiting number of recommendations"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]  # Python has many related skills
-
-        # Create market skills for Python-related skills
-        market_skills = {
-            "fastapi": {"frequency": 20.0, "avg_salary": None},
-            "django": {"frequency": 19.0, "avg_salary": None},
-            "postgresql": {"frequency": 18.0, "avg_salary": None},
-            "redis": {"frequency": 17.0, "avg_salary": None},
-            "docker": {"frequency": 16.0, "avg_salary": None},
-            "aws": {"frequency": 15.0, "avg_salary": None},
-            "celery": {"frequency": 14.0, "avg_salary": None},
-        }
-        skill_gaps = list(market_skills.keys())
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps, top_n=3)
-
-        assert len(recommendations) == 3
-
-    def test_generate_recommendations_only_related_skills(self):
-        """Test that only skills related to user's existing skills are recommended"""
-        mock_user = MagicMock()
-        mock_user.skills = ["Python"]
-
-        # kubernetes is NOT related to Python in SKILL_PATHS
-        market_skills = {
+        }),
+        ["celery", "fastapi", "django"], 10,
+        [("fastapi", "high"), ("django", "medium"), ("celery", "low"), *_PY_RELATED_LOW],
+        id="sorted_by_priority",
+    ),
+    pytest.param(
+        ["Python"], _TOP_N_MARKET, _TOP_N_GAPS, 3,
+        [("fastapi", "high"), ("django", "high"), ("postgresql", "high")],
+        id="top_n",
+    ),
+    pytest.param(
+        ["Python"],
+        _frozen_market({
             "kubernetes": {"frequency": 50.0, "avg_salary": 200000},
-            "fastapi": {"frequency": 25.0, "avg_salary": 150000},  # IS related to Python
-        }
-        skill_gaps = ["kubernetes", "fastapi"]
-
-        recommendations = generate_skill_recommendations(mock_user, market_skills, skill_gaps)
-
-        # Should include fastapi (related to Python) but not kubernetes
-        skill_names = [r["skill"].lower() for r in recommendations]
-        assert "fastapi" in skill_names
-        # kubernetes might be included if Docker is in user's skills, but Python alone doesn't lead to k8s
-
-
-class TestEstimateLearningEffort:
-    """Test learning effort estimation"""
-
-    def test_estimate_effort_with_related_skills(self):
-        """Test low effort when user has related skills"""
-        # Use canonical names as returned by normalize_skill
-        user_skills = {"Python", "Django", "Flask"}
-
-        effort = estimate_learning_effort("fastapi", user_skills)
-
-        assert effort == "low"
-
-    def test_estimate_effort_frontend_related(self):
-        """Test frontend skill with frontend background"""
-        user_skills = {"React", "JavaScript"}
-
-        effort = estimate_learning_effort("vue", user_skills)
-
-        assert effort == "low"
+            "fastapi": {"frequency": 25.0, "avg_salary": 150000},
+        }),
+        ["kubernetes", "fastapi"], 10,
+        # kubernetes is the most frequent gap but unrelated to Python, so it is dropped
+        [("fastapi", "high"), ("django", "low"), *_PY_RELATED_LOW, ("celery", "low")],
+        id="only_related_skills",
+    ),
+)
 
-    def test_estimate_effort_no_related_skills_foundational(self):
-        """Test foundational skill without related background"""
-        # User has only frontend skills, learning a foundational backend skill
-        user_skills = {"HTML", "CSS", "React"}
 
-        effort = estimate_learning_effort("python", user_skills)
+@pytest.fixture
+def recommendation_user():
+    """Plain user stand-in for recommendation cases (tests set .skills)"""
+    return SimpleNamespace(id=1, skills=None)
 
-        assert effort == "medium"
 
-    def test_estimate_effort_no_related_skills_advanced(self):
-        """Test advanced skill without related background"""
-        user_skills = {"HTML", "CSS"}
+class TestGenerateSkillRecommendations:
+    """Test skill recommendation generation (profile-aware)"""
 
-        effort = estimate_learning_effort("kubernetes", user_skills)
+    @pytest.mark.parametrize("user_skills,market_skills,skill_gaps,top_n,expected", RECOMMENDATION_CASES)
+    def test_generate_recommendations(
+        self, recommendation_user, user_skills, market_skills, skill_gaps, top_n, expected
+    ):
+        """Test recommendation priority, ordering and filtering"""
+        recommendation_user.skills = user_skills
 
-        assert effort == "high"
+        recommendations = generate_skill_recommendations(
+            recommendation_user, market_skills, skill_gaps, top_n=top_n
+        )
 
-    def test_estimate_effort_unknown_skill(self):
-        """Test unknown skill defaults to medium"""
-        user_skills = {"Python"}
+        assert [(r["skill"], r["priority"]) for r in recommendations] == expected
 
-        effort = estimate_learning_effort("some_obscure_framework", user_skills)
+    def test_generate_recommendations_missing_salary(self, recommendation_user):
+        """Test skills without salary data have no salary impact"""
+        recommendation_user.skills = ["Python"]
+        market_skills = _frozen_market({"celery": {"frequency": 3.0, "avg_salary": None}})
 
-        assert effort == "medium"
+        recommendations = generate_skill_recommendations(recommendation_user, market_skills, ["celery"])
 
-    def test_estimate_effort_devops_with_devops_background(self):
-        """Test devops skill with devops background"""
-        user_skills = {"Docker", "Terraform"}
+        assert recommendations[0]["skill"] == "celery"
+        assert recommendations[0]["salary_impact"] is None
 
-        effort = estimate_learning_effort("kubernetes", user_skills)
 
-        assert effort == "low"
+# (skill, user_skills, expected effort); user skills use canonical names as returned by normalize_skill
+LEARNING_EFFORT_CASES = (
+    pytest.param("fastapi", {"Python", "Django", "Flask"}, "low", id="related_skills"),
+    pytest.param("vue", {"React", "JavaScript"}, "low", id="frontend_related"),
+    # Frontend-only user learning a foundational backend skill
+    pytest.param("python", {"HTML", "CSS", "React"}, "medium", id="no_related_foundational"),
+    pytest.param("kubernetes", {"HTML", "CSS"}, "high", id="no_related_advanced"),
+    pytest.param("some_obscure_framework", {"Python"}, "medium", id="unknown_skill"),
+    pytest.param("kubernetes", {"Docker", "Terraform"}, "low", id="devops_background"),
+    pytest.param("pytorch", {"Python", "TensorFlow"}, "low", id="ml_background"),
+)
 
-    def test_estimate_effort_ml_with_ml_background(self):
-        """Test ML skill with ML background"""
-        user_skills = {"Python", "TensorFlow"}
 
-        effort = estimate_learning_effort("pytorch", user_skills)
+class TestEstimateLearningEffort:
+    """Test learning effort estimation"""
 
-        assert effort == "low"
+    @pytest.mark.parametrize("skill,user_skills,expected", LEARNING_EFFORT_CASES)
+    def test_estimate_learning_effort(self, skill, user_skills, expected):
+        """Test effort is low with related skills, otherwise medium/high by skill difficulty"""
+        assert estimate_learning_effort(skill, user_skills) == expected
 
 
 class TestCreateOrUpdateSkillAnalysis:
     """Test skill analysis creation/update"""
 
-    def test_create_new_analysis(self):
+    def test_create_new_analysis(self, db_query_factory):
         """Test creating new analysis"""
-        mock_db = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = None
+        mock_db, _ = db_query_factory(first=None)
 
-        mock_user = MagicMock()
-        mock_user.id = 1
-        mock_user.skills = ["Python", "Django"]
+        mock_user = SimpleNamespace(id=1, skills=["Python", "Django"])
 
         market_skills = {"python": {"frequency": 50.0}}
         skill_gaps = ["kubernetes"]
@@ -437,17 +386,13 @@ class TestCreateOrUpdateSkillAnalysis:
         mock_db.commit.assert_called_once()
         mock_db.refresh.assert_called_once()
 
-    def test_update_existing_analysis(self):
+    def test_update_existing_analysis(self, db_query_factory):
         """Test updating existing analysis"""
-        mock_db = MagicMock()
-
         # Mock existing analysis
-        mock_analysis = MagicMock()
-        mock_db.query.return_value.filter.return_value.first.return_value = mock_analysis
+        mock_analysis = Mock(spec_set=SkillAnalysis)
+        mock_db, _ = db_query_factory(first=mock_analysis)
 
-        mock_user = MagicMock()
-        mock_user.id = 1
-        mock_user.skills = ["Python"]
+        mock_user = SimpleNamespace(id=1, skills=["Python"])
 
         market_skills = {"python": {"frequency": 50.0}}
         skill_gaps = ["docker"]
@@ -472,69 +417,60 @@ class TestCreateOrUpdateSkillAnalysis:
         assert mock_analysis.skill_gaps == skill_gaps
 
 
+@pytest.fixture
+def insights_mocks():
+    """Patch the four pipeline steps of run_skill_analysis_for_user in one pass"""
+    with patch.multiple(
+        _insights,
+        analyze_market_skills=DEFAULT,
+        identify_skill_gaps=DEFAULT,
+        generate_skill_recommendations=DEFAULT,
+        create_or_update_skill_analysis=DEFAULT,
+    ) as mocks:
+        mocks["create_or_update_skill_analysis"].return_value = MagicMock(spec=SkillAnalysis)
+        yield SimpleNamespace(
+            analyze=mocks["analyze_market_skills"],
+            identify=mocks["identify_skill_gaps"],
+            recommend=mocks["generate_skill_recommendations"],
+            create=mocks["create_or_update_skill_analysis"],
+        )
+
+
 class TestRunSkillAnalysisForUser:
     """Test complete skill analysis workflow"""
 
-    @patch('app.services.insights.create_or_update_skill_analysis')
-    @patch('app.services.insights.generate_skill_recommendations')
-    @patch('app.services.insights.identify_skill_gaps')
-    @patch('app.services.insights.analyze_market_skills')
-    def test_run_skill_analysis_workflow(
-        self,
-        mock_analyze,
-        mock_identify,
-        mock_recommend,
-        mock_create
-    ):
+    def test_run_skill_analysis_workflow(self, insights_mocks, db_query_factory):
         """Test complete analysis workflow"""
-        mock_db = MagicMock()
-        mock_db.query.return_value.scalar.return_value = 100  # Job count
+        mock_db, _ = db_query_factory(scalar=100)  # Job count
 
-        mock_user = MagicMock()
-        mock_user.id = 1
-        mock_user.skills = ["Python"]
+        mock_user = SimpleNamespace(id=1, skills=["Python"])
 
         # Set up mock returns
-        mock_analyze.return_value = {"python": {"frequency": 50.0}}
-        mock_identify.return_value = ["kubernetes"]
-        mock_recommend.return_value = [{"skill": "kubernetes", "priority": "high"}]
-        mock_create.return_value = MagicMock()
+        insights_mocks.analyze.return_value = {"python": {"frequency": 50.0}}
+        insights_mocks.identify.return_value = ["kubernetes"]
+        insights_mocks.recommend.return_value = [{"skill": "kubernetes", "priority": "high"}]
 
         result = run_skill_analysis_for_user(mock_db, mock_user)
 
         # Verify all steps were called
-        mock_analyze.assert_called_once_with(mock_db)
-        mock_identify.assert_called_once()
-        mock_recommend.assert_called_once()
-        mock_create.assert_called_once()
-
-    @patch('app.services.insights.create_or_update_skill_analysis')
-    @patch('app.services.insights.generate_skill_recommendations')
-    @patch('app.services.insights.identify_skill_gaps')
-    @patch('app.services.insights.analyze_market_skills')
-    def test_run_skill_analysis_with_no_skills(
-        self,
-        mock_analyze,
-        mock_identify,
-        mock_recommend,
-        mock_create
-    ):
+        insights_mocks.analyze.assert_called_once_with(mock_db)
+        insights_mocks.identify.assert_called_once()
+        insights_mocks.recommend.assert_called_once()
+        insights_mocks.create.assert_called_once()
+
+    def test_run_skill_analysis_with_no_skills(self, insights_mocks, db_query_factory):
         """Test analysis for user with no skills"""
-        mock_db = MagicMock()
-        mock_db.query.return_value.scalar.return_value = 50
+        mock_db, _ = db_query_factory(scalar=50)
 
-        mock_user = MagicMock()
-        mock_user.id = 1
-        mock_user.skills = None  # No skills
+        mock_user = SimpleNamespace(id=1, skills=None)  # No skills
 
-        mock_analyze.return_value = {}
-        mock_identify.return_value = []
-        mock_recommend.return_value = []
-        mock_create.return_value = MagicMock()
+        insights_mocks.analyze.return_value = {}
+        insights_mocks.identify.return_value = []
+        insights_mocks.recommend.return_value = []
 
         result = run_skill_analysis_for_user(mock_db, mock_user)
 
         # Should handle None skills gracefully
-        mock_identify.assert_called_once()
-        args, kwargs = mock_identify.call_args
+        insights_mocks.identify.assert_called_once()
+        args, kwargs = insights_mocks.identify.call_args
         assert args[0] == []  # Empty list passed instead of None
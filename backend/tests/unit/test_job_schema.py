@@ -5,7 +5,81 @@ import pytest
 from pydantic import ValidationError
 from datetime import datetime
 
-from app.schemas.job import JobScrapedData, sanitize_html_content
+from app.schemas.job import (
+    MAX_DESCRIPTION_LENGTH,
+    MAX_TAG_LENGTH,
+    MAX_TITLE_LENGTH,
+    URL_PATTERN,
+    JobScrapedData,
+    sanitize_html_content,
+)
+
+pytestmark = pytest.mark.xdist_group(name="unit-schema")
+
+# Resolve the compiled pydantic-core validator once instead of per construction
+_VALIDATOR = JobScrapedData.__pydantic_validator__
+
+
+def _make(**job_data):
+    """Validate job_data into a JobScrapedData via the cached core validator"""
+    return _VALIDATOR.validate_python(job_data)
+
+
+def _assert_error(exc_info, field, msg=None):
+    """Assert the ValidationError has an error on field, optionally containing msg"""
+    errors = exc_info.value.errors(include_url=False, include_context=False, include_input=False)
+    messages = [error["msg"] for error in errors if error["loc"][:1] == (field,)]
+    assert messages, f"no error for {field!r} in {errors}"
+    if msg is not None:
+        assert any(msg in message for message in messages), messages
+
+
+_REQUIRED_FIELDS = {
+    "source_id": "job123",
+    "url": "https://example.com/job",
+    "title": "Developer",
+    "company": "Company",
+    "description": "Description",
+}
+
+VALID_URLS = (
+    "https://example.com/job/123",
+    "http://example.com/job",
+    "https://subdomain.example.com/path",
+    "https://example.com:8080/job",
+    "http://localhost:3000/job",
+    "https://192.168.1.1/job",
+)
+
+INVALID_URLS = (
+    "not-a-valid-url",
+    "ftp://example.com/job",
+    "https://",
+    "https://example .com/job",
+)
+
+# Values one character past each schema limit, built once
+_LONG_TITLE = "X" * (MAX_TITLE_LENGTH + 1)
+_LONG_DESC = "X" * (MAX_DESCRIPTION_LENGTH + 1)
+_LONG_TAG = "x" * (MAX_TAG_LENGTH + 1)
+
+# (field, value just past its limit, expected substring of that field's error message)
+FIELD_BOUNDARY_CASES = (
+    pytest.param("title", _LONG_TITLE, f"at most {MAX_TITLE_LENGTH}", id="title_too_long"),
+    pytest.param("description", _LONG_DESC, f"at most {MAX_DESCRIPTION_LENGTH}", id="description_too_long"),
+    pytest.param("salary_min", -1000, "greater than or equal to 0", id="negative_salary"),
+    pytest.param("tags", [_LONG_TAG], "Tag exceeds max length", id="tag_too_long"),
+)
+
+_UNSAFE_ITEM = "<script>item</script>"
+_ESCAPED_ITEM = "&lt;script&gt;item&lt;/script&gt;"
+_BIG_LIST = [_UNSAFE_ITEM] * 1000
+
+
+@pytest.fixture
+def base_job():
+    """Fresh dict of required JobScrapedData fields that tests can mutate"""
+    return dict(_REQUIRED_FIELDS)
 
 
 class TestJobScrapedDataValidation:
@@ -28,225 +102,122 @@ class TestJobScrapedDataValidation:
             "tags": ["python", "django", "postgresql"],
         }
 
-        validated = JobScrapedData(**job_data)
+        validated = _make(**job_data)
 
         assert validated.source_id == "job123"
         assert validated.title == "Senior Python Developer"
         assert validated.salary_min == 100000
         assert validated.tags == ["python", "django", "postgresql"]
 
-    def test_minimal_required_fields(self):
+    def test_minimal_required_fields(self, base_job):
         """Test validation with only required fields"""
-        job_data = {
-            "source_id": "job456",
-            "url": "https://example.com/job/456",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Job description",
-        }
+        validated = _make(**base_job)
 
-        validated = JobScrapedData(**job_data)
-
-        assert validated.source_id == "job456"
+        assert validated.source_id == "job123"
         assert validated.salary_currency is None  # default (None when no salary)
         assert validated.location == "Remote"  # default
         assert validated.remote_type == "full"  # default
         assert validated.job_type == "permanent"  # default
         assert validated.tags == []  # default
 
-    def test_missing_required_field_source_id(self):
+    def test_missing_required_field_source_id(self, base_job):
         """Test validation fails without source_id"""
-        job_data = {
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-        }
+        del base_job["source_id"]
 
         with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+            _make(**base_job)
 
-        assert "source_id" in str(exc_info.value)
+        _assert_error(exc_info, "source_id")
 
-    def test_missing_required_field_url(self):
+    def test_missing_required_field_url(self, base_job):
         """Test validation fails without url"""
-        job_data = {
-            "source_id": "job123",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-        }
+        del base_job["url"]
 
         with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+            _make(**base_job)
 
-        assert "url" in str(exc_info.value)
+        _assert_error(exc_info, "url")
 
-    def test_invalid_url_format(self):
+    def test_invalid_url_format(self, base_job):
         """Test validation fails with invalid URL"""
-        job_data = {
-            "source_id": "job123",
-            "url": "not-a-valid-url",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-        }
+        base_job["url"] = "not-a-valid-url"
 
         with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+            _make(**base_job)
 
-        assert "Invalid URL format" in str(exc_info.value)
+        _assert_error(exc_info, "url", "Invalid URL format")
 
-    def test_valid_url_formats(self):
+    @pytest.mark.parametrize("url", VALID_URLS)
+    def test_valid_url_formats(self, base_job, url):
         """Test various valid URL formats"""
-        valid_urls = [
-            "https://example.com/job/123",
-            "http://example.com/job",
-            "https://subdomain.example.com/path",
-            "https://example.com:8080/job",
-            "http://localhost:3000/job",
-            "https://192.168.1.1/job",
-        ]
-
-        for url in valid_urls:
-            job_data = {
-                "source_id": "job123",
-                "url": url,
-                "title": "Developer",
-                "company": "Company",
-                "description": "Description",
-            }
-            validated = JobScrapedData(**job_data)
-            assert validated.url == url
+        base_job["url"] = url
 
-    def test_title_too_long(self):
-        """Test validation fails when title exceeds max length"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "X" * 501,  # MAX_TITLE_LENGTH is 500
-            "company": "Company",
-            "description": "Description",
-        }
-
-        with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+        validated = _make(**base_job)
 
-        assert "title" in str(exc_info.value)
+        assert validated.url == url
 
-    def test_description_too_long(self):
-        """Test validation fails when description exceeds max length"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "X" * 50001,  # MAX_DESCRIPTION_LENGTH is 50000
-        }
+    @pytest.mark.parametrize("field,value,msg_substr", FIELD_BOUNDARY_CASES)
+    def test_field_boundaries(self, base_job, field, value, msg_substr):
+        """Test validation fails when a field exceeds its bounds"""
+        base_job[field] = value
 
         with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+            _make(**base_job)
 
-        assert "description" in str(exc_info.value)
+        _assert_error(exc_info, field, msg_substr)
 
-    def test_salary_range_validation(self):
+    def test_salary_range_validation(self, base_job):
         """Test salary_max must be >= salary_min"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "salary_min": 150000,
-            "salary_max": 100000,  # Less than min
-        }
-
-        with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
-
-        assert "salary_max" in str(exc_info.value)
-        assert "salary_min" in str(exc_info.value)
-
-    def test_negative_salary(self):
-        """Test validation fails with negative salary"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "salary_min": -1000,
-        }
+        base_job["salary_min"] = 150000
+        base_job["salary_max"] = 100000  # Less than min
 
         with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
+            _make(**base_job)
 
-        assert "salary_min" in str(exc_info.value)
+        _assert_error(exc_info, "salary_max", "salary_min")
 
-    def test_tags_validation_removes_empty_strings(self):
+    def test_tags_validation_removes_empty_strings(self, base_job):
         """Test empty strings are removed from tags"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "tags": ["python", "", "  ", "django", ""],
-        }
+        base_job["tags"] = ["python", "", "  ", "django", ""]
 
-        validated = JobScrapedData(**job_data)
+        validated = _make(**base_job)
 
         assert validated.tags == ["python", "django"]
         assert "" not in validated.tags
 
-    def test_tags_whitespace_trimmed(self):
+    def test_tags_whitespace_trimmed(self, base_job):
         """Test tags have whitespace trimmed"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "tags": ["  python  ", " django", "postgresql  "],
-        }
+        base_job["tags"] = ["  python  ", " django", "postgresql  "]
 
-        validated = JobScrapedData(**job_data)
+        validated = _make(**base_job)
 
         assert validated.tags == ["python", "django", "postgresql"]
 
-    def test_tag_too_long(self):
-        """Test validation fails when tag exceeds max length"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "tags": ["x" * 101],  # MAX_TAG_LENGTH is 100
-        }
-
-        with pytest.raises(ValidationError) as exc_info:
-            JobScrapedData(**job_data)
-
-        assert "Tag exceeds max length" in str(exc_info.value)
-
-    def test_whitespace_stripped_from_text_fields(self):
+    def test_whitespace_stripped_from_text_fields(self, base_job):
         """Test leading/trailing whitespace is stripped from text fields"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "  Developer  ",
-            "company": "  Tech Corp  ",
-            "description": "  Great job  ",
-        }
+        base_job.update(title="  Developer  ", company="  Tech Corp  ", description="  Great job  ")
 
-        validated = JobScrapedData(**job_data)
+        validated = _make(**base_job)
 
         assert validated.title == "Developer"
         assert validated.company == "Tech Corp"
         assert validated.description == "Great job"
 
 
+class TestURLPattern:
+    """Test the compiled URL regex behind JobScrapedData.validate_url directly"""
+
+    @pytest.mark.parametrize("url", VALID_URLS)
+    def test_url_pattern_accepts(self, url):
+        """Test URL_PATTERN matches the URLs the schema accepts"""
+        assert URL_PATTERN.match(url)
+
+    @pytest.mark.parametrize("url", INVALID_URLS)
+    def test_url_pattern_rejects(self, url):
+        """Test URL_PATTERN rejects malformed and non-http(s) URLs"""
+        assert URL_PATTERN.match(url) is None
+
+
 class TestHTMLSanitization:
     """Test HTML sanitization function"""
 
@@ -327,36 +298,27 @@ class TestHTMLSanitization:
         # At depth 3, sanitization stops
         assert result["level1"]["level2"]["level3"]["level4"] == "<script>deep</script>"
 
-    def test_sanitize_large_list_optimization(self):
+    @pytest.mark.parametrize("size", [100, 150, 1000])
+    def test_sanitize_large_list_optimization(self, size):
         """Test large lists only process first 100 items"""
-        # Create list with 150 items
-        large_list = ["<script>item</script>"] * 150
+        result = sanitize_html_content(_BIG_LIST[:size])
 
-        result = sanitize_html_content(large_list)
-
-        # First 100 should be sanitized
-        assert result[0] == "&lt;script&gt;item&lt;/script&gt;"
-        assert result[99] == "&lt;script&gt;item&lt;/script&gt;"
+        # Up to the first 100 items are sanitized
+        sanitized = min(size, 100)
+        assert len(result) == size
+        assert result[:sanitized] == [_ESCAPED_ITEM] * sanitized
 
         # Items after 100 should be unchanged (optimization)
-        assert result[100] == "<script>item</script>"
-        assert result[149] == "<script>item</script>"
+        assert result[sanitized:] == [_UNSAFE_ITEM] * (size - sanitized)
 
-    def test_raw_data_sanitization_in_schema(self):
+    def test_raw_data_sanitization_in_schema(self, base_job):
         """Test raw_data field is sanitized when creating JobScrapedData"""
-        job_data = {
-            "source_id": "job123",
-            "url": "https://example.com/job",
-            "title": "Developer",
-            "company": "Company",
-            "description": "Description",
-            "raw_data": {
-                "original_title": "<b>Bold Title</b>",
-                "metadata": {"posted": "<script>xss</script>"},
-            },
+        base_job["raw_data"] = {
+            "original_title": "<b>Bold Title</b>",
+            "metadata": {"posted": "<script>xss</script>"},
         }
 
-        validated = JobScrapedData(**job_data)
+        validated = _make(**base_job)
 
         assert validated.raw_data["original_title"] == "&lt;b&gt;Bold Title&lt;/b&gt;"
         assert validated.raw_data["metadata"]["posted"] == "&lt;script&gt;xss&lt;/script&gt;"
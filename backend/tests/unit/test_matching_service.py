@@ -2,10 +2,13 @@
 Unit tests for matching service
 """
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, Mock
+
+from sqlalchemy.orm import Session
 
 from app.services.matching import (
     calculate_skill_match,
+    calculate_skill_match_ratio,
     calculate_work_type_match,
     should_match_remote_type,
     should_match_eligibility,
@@ -16,10 +19,49 @@ from app.services.matching import (
     calculate_salary_match,
     calculate_experience_match,
     calculate_title_match,
+    calculate_match_score,
+    calculate_match_score_ceiling,
+    create_match_for_job,
+    match_user_with_all_jobs,
+    match_job_with_all_users,
+    MATCH_SCORE_WEIGHTS,
+    TITLE_ROLE_KEYWORDS,
+    _title_roles,
+)
+from app.utils.skill_aliases import SKILL_ALIASES, normalize_skill
+from app.utils.skill_clusters import (
+    SKILL_CLUSTERS,
+    calculate_skill_similarity,
+    are_skills_related,
+    get_related_skills,
+    get_skill_clusters,
 )
-from app.utils.skill_aliases import normalize_skill
-from app.utils.skill_clusters import calculate_skill_similarity, are_skills_related, get_related_skills
 from datetime import datetime, timezone, timedelta
+from types import SimpleNamespace
+
+
+def _job(**attrs):
+    """Lightweight job exposing only the attributes the matching filters and scorers read"""
+    return SimpleNamespace(**{
+        "id": 1,
+        "job_type": None,
+        "remote_type": None,
+        "location": None,
+        "eligible_regions": None,
+        "visa_sponsorship": None,
+        "salary_min": None,
+        "salary_max": None,
+        "title": None,
+        "posted_at": None,
+        "scraped_at": None,
+        "created_at": None,
+        **attrs,
+    })
+
+
+def _days_ago(days):
+    """Timezone-aware timestamp the given number of days in the past"""
+    return datetime.now(timezone.utc) - timedelta(days=days)
 
 
 class TestNormalizeSkill:
@@ -64,6 +106,11 @@ class TestNormalizeSkill:
         assert normalize_skill("SomeUnknownSkill") == "SomeUnknownSkill"
         assert normalize_skill("custom framework") == "custom framework"
 
+    def test_every_canonical_name_resolves_to_itself(self):
+        """Test each canonical name normalizes to itself regardless of case"""
+        for canonical in set(SKILL_ALIASES.values()):
+            assert normalize_skill(canonical.upper()) == canonical
+
 
 class TestCalculateSkillMatch:
     """Test skill match calculation"""
@@ -90,6 +137,18 @@ class TestCalculateSkillMatch:
         assert missing == []
         assert related == []
 
+    def test_unknown_skills_match_case_insensitively(self):
+        """Test skills without an alias entry still match exactly regardless of case"""
+        user_skills = ["Custom Framework"]
+        job_requirements = {"required_skills": ["custom framework"]}
+
+        score, matches, missing, related = calculate_skill_match(user_skills, job_requirements)
+
+        assert score == 80.0
+        assert matches == ["custom framework"]
+        assert missing == []
+        assert related == []
+
     def test_partial_skill_match(self):
         """Test when some skills match"""
         user_skills = ["Python", "JavaScript"]
@@ -173,310 +232,212 @@ class TestCalculateSkillMatch:
         assert missing == []  # Django is related, not missing
 
 
-class TestCalculateWorkTypeMatch:
-    """Test work type matching"""
+# (user_preferences, job attributes, expected score)
+WORK_TYPE_CASES = (
+    pytest.param({}, {"job_type": "permanent"}, 100.0, id="no_preference"),
+    pytest.param({"job_types": ["contract", "freelance"]}, {"job_type": "contract"}, 100.0, id="matching"),
+    pytest.param({"job_types": ["contract"]}, {"job_type": "permanent"}, 0.0, id="non_matching"),
+)
 
-    def test_no_preference(self):
-        """Test when user has no work type preference"""
-        job = MagicMock()
-        job.job_type = "permanent"
 
-        score = calculate_work_type_match({}, job)
-        assert score == 100.0
+class TestCalculateSkillMatchRatio:
+    """Test the skill overlap ratio behind the minimum-skills hard filter"""
 
-    def test_matching_work_type(self):
-        """Test when work type matches preference"""
-        job = MagicMock()
-        job.job_type = "contract"
+    def test_counts_exact_and_related_skills(self):
+        """Test exact and same-cluster skills both count as matched"""
+        # Django is exact, Flask is related to Python/Django, Figma is unrelated
+        ratio, matched, total = calculate_skill_match_ratio(["Python", "Django"], ["django", "Flask", "Figma"])
 
-        score = calculate_work_type_match({"job_types": ["contract", "freelance"]}, job)
-        assert score == 100.0
+        assert (matched, total) == (2, 3)
+        assert ratio == pytest.approx(2 / 3)
 
-    def test_non_matching_work_type(self):
-        """Test when work type doesn't match"""
-        job = MagicMock()
-        job.job_type = "permanent"
+    def test_unaliased_skills_match_case_insensitively(self):
+        """Test exact and related matches use the same casefolded keys as calculate_skill_match"""
+        # "celery" has no alias entry but is clustered with Python
+        ratio, matched, total = calculate_skill_match_ratio(["Custom Framework", "Python"], ["custom framework", "celery"])
 
-        score = calculate_work_type_match({"job_types": ["contract"]}, job)
-        assert score == 0.0
+        assert (ratio, matched, total) == (1.0, 2, 2)
 
+    def test_no_job_skills(self):
+        """Test an empty requirement list yields a zero ratio"""
+        assert calculate_skill_match_ratio(["Python"], []) == (0.0, 0, 0)
 
-class TestShouldMatchRemoteType:
-    """Test remote type filtering"""
 
-    def test_no_preference(self):
-        """Test when user has no remote preference"""
-        job = MagicMock()
-        job.remote_type = "full"
+class TestCalculateWorkTypeMatch:
+    """Test work type matching"""
 
-        assert should_match_remote_type({}, job) is True
+    @pytest.mark.parametrize("prefs,attrs,expected", WORK_TYPE_CASES)
+    def test_calculate_work_type_match(self, prefs, attrs, expected):
+        """Test work type score against the user's job type preferences"""
+        assert calculate_work_type_match(prefs, _job(**attrs)) == expected
 
-    def test_matching_remote_type(self):
-        """Test when remote type matches"""
-        job = MagicMock()
-        job.remote_type = "full"
 
-        assert should_match_remote_type({"remote_types": ["full", "hybrid"]}, job) is True
+# (user_preferences, job attributes, expected result)
+REMOTE_TYPE_CASES = (
+    pytest.param({}, {"remote_type": "full"}, True, id="no_preference"),
+    pytest.param({"remote_types": ["full", "hybrid"]}, {"remote_type": "full"}, True, id="matching"),
+    pytest.param({"remote_types": ["full"]}, {"remote_type": "onsite"}, False, id="non_matching"),
+)
+
 
-    def test_non_matching_remote_type(self):
-        """Test when remote type doesn't match"""
-        job = MagicMock()
-        job.remote_type = "onsite"
+class TestShouldMatchRemoteType:
+    """Test remote type filtering"""
 
-        assert should_match_remote_type({"remote_types": ["full"]}, job) is False
+    @pytest.mark.parametrize("prefs,attrs,expected", REMOTE_TYPE_CASES)
+    def test_should_match_remote_type(self, prefs, attrs, expected):
+        """Test remote type filter against the user's remote preferences"""
+        assert should_match_remote_type(prefs, _job(**attrs)) is expected
+
+
+# (user_preferences, job attributes, expected result); visa_sponsorship: 0 = no, 1 = yes, None = unknown
+ELIGIBILITY_CASES = (
+    pytest.param({}, {"eligible_regions": ["USA"]}, True, id="no_region_preference"),
+    pytest.param({"eligible_regions": ["Europe"]}, {"eligible_regions": ["Worldwide"]}, True, id="worldwide_job"),
+    pytest.param({"eligible_regions": ["Worldwide"]}, {"eligible_regions": ["USA"]}, True, id="worldwide_user"),
+    pytest.param({"eligible_regions": ["europe"]}, {"eligible_regions": ["USA", "Europe"]}, True, id="matching_region"),
+    pytest.param({"eligible_regions": ["Asia"]}, {"eligible_regions": ["USA"]}, False, id="non_matching_region"),
+    pytest.param({"eligible_regions": ["Asia", "EU"]}, {"eligible_regions": ["eu", "UK"]}, True, id="overlap_among_many"),
+    pytest.param({"eligible_regions": ["Asia"]}, {}, True, id="unspecified_job_regions_default_worldwide"),
+    pytest.param({"needs_visa_sponsorship": True}, {"visa_sponsorship": 0}, False, id="needs_visa_not_offered"),
+    pytest.param({"needs_visa_sponsorship": True}, {"visa_sponsorship": 1}, True, id="needs_visa_offered"),
+    pytest.param({"needs_visa_sponsorship": True}, {"visa_sponsorship": None}, True, id="needs_visa_unknown"),
+)
 
 
 class TestShouldMatchEligibility:
     """Test employment eligibility filtering"""
 
-    def test_no_region_preference(self):
-        """Test when user has no region preference"""
-        job = MagicMock()
-        job.eligible_regions = ["USA"]
-        job.visa_sponsorship = None
-
-        assert should_match_eligibility({}, job) is True
-
-    def test_worldwide_job(self):
-        """Test job that accepts worldwide applicants"""
-        job = MagicMock()
-        job.eligible_regions = ["Worldwide"]
-        job.visa_sponsorship = None
-
-        assert should_match_eligibility({"eligible_regions": ["Europe"]}, job) is True
-
-    def test_worldwide_user(self):
-        """Test user who can work worldwide"""
-        job = MagicMock()
-        job.eligible_regions = ["USA"]
-        job.visa_sponsorship = None
-
-        assert should_match_eligibility({"eligible_regions": ["Worldwide"]}, job) is True
-
-    def test_matching_region(self):
-        """Test matching region"""
-        job = MagicMock()
-        job.eligible_regions = ["USA", "Europe"]
-        job.visa_sponsorship = None
-
-        assert should_match_eligibility({"eligible_regions": ["europe"]}, job) is True
-
-    def test_non_matching_region(self):
-        """Test non-matching region"""
-        job = MagicMock()
-        job.eligible_regions = ["USA"]
-        job.visa_sponsorship = None
-
-        assert should_match_eligibility({"eligible_regions": ["Asia"]}, job) is False
-
-    def test_needs_visa_but_not_offered(self):
-        """Test when user needs visa but job doesn't offer"""
-        job = MagicMock()
-        job.eligible_regions = None
-        job.visa_sponsorship = 0  # No sponsorship
-
-        assert should_match_eligibility({"needs_visa_sponsorship": True}, job) is False
-
-    def test_needs_visa_and_offered(self):
-        """Test when user needs visa and job offers it"""
-        job = MagicMock()
-        job.eligible_regions = None
-        job.visa_sponsorship = 1  # Offers sponsorship
-
-        assert should_match_eligibility({"needs_visa_sponsorship": True}, job) is True
-
-    def test_needs_visa_unknown(self):
-        """Test when visa sponsorship is unknown"""
-        job = MagicMock()
-        job.eligible_regions = None
-        job.visa_sponsorship = None  # Unknown
-
-        assert should_match_eligibility({"needs_visa_sponsorship": True}, job) is True
+    @pytest.mark.parametrize("prefs,attrs,expected", ELIGIBILITY_CASES)
+    def test_should_match_eligibility(self, prefs, attrs, expected):
+        """Test region and visa sponsorship eligibility filter"""
+        assert should_match_eligibility(prefs, _job(**attrs)) is expected
+
+
+# (user_preferences, job attributes, expected score)
+LOCATION_CASES = (
+    pytest.param(
+        {}, {"location": "San Francisco, CA", "remote_type": "onsite"}, 100.0, id="no_preference",
+    ),
+    pytest.param(
+        {"preferred_countries": ["Remote"]}, {"location": "Anywhere", "remote_type": "full"}, 100.0,
+        id="remote_preference_full_remote",
+    ),
+    pytest.param(
+        {"preferred_countries": ["Germany"]}, {"location": "Berlin, Germany", "remote_type": "hybrid"}, 100.0,
+        id="matching_country",
+    ),
+    pytest.param(
+        {"preferred_countries": ["USA"]}, {"location": "Tokyo, Japan", "remote_type": "onsite"}, 30.0,
+        id="non_matching_location",
+    ),
+    pytest.param(
+        {"preferred_countries": [" germany "]}, {"location": "Remote - Germany", "remote_type": "hybrid"}, 100.0,
+        id="free_form_location_case_insensitive",
+    ),
+    pytest.param(
+        {"preferred_countries": ["  "]}, {"location": "USA", "remote_type": "onsite"}, 30.0,
+        id="blank_preference_does_not_match",
+    ),
+    pytest.param(
+        {"preferred_countries": ["Germany"]}, {"location": None, "remote_type": "onsite"}, 30.0,
+        id="missing_location",
+    ),
+)
 
 
 class TestCalculateLocationMatch:
     """Test location matching"""
 
-    def test_no_preference(self):
-        """Test when user has no location preference"""
-        job = MagicMock()
-        job.location = "San Francisco, CA"
-        job.remote_type = "onsite"
-
-        score = calculate_location_match({}, job)
-        assert score == 100.0
-
-    def test_remote_preference_full_remote(self):
-        """Test remote preference with fully remote job"""
-        job = MagicMock()
-        job.location = "Anywhere"
-        job.remote_type = "full"
-
-        score = calculate_location_match({"preferred_countries": ["Remote"]}, job)
-        assert score == 100.0
-
-    def test_matching_country(self):
-        """Test matching country preference"""
-        job = MagicMock()
-        job.location = "Berlin, Germany"
-        job.remote_type = "hybrid"
-
-        score = calculate_location_match({"preferred_countries": ["Germany"]}, job)
-        assert score == 100.0
-
-    def test_non_matching_location(self):
-        """Test non-matching location"""
-        job = MagicMock()
-        job.location = "Tokyo, Japan"
-        job.remote_type = "onsite"
-
-        score = calculate_location_match({"preferred_countries": ["USA"]}, job)
-        assert score == 30.0
+    @pytest.mark.parametrize("prefs,attrs,expected", LOCATION_CASES)
+    def test_calculate_location_match(self, prefs, attrs, expected):
+        """Test location score against the user's preferred countries"""
+        assert calculate_location_match(prefs, _job(**attrs)) == expected
+
+
+# (user_preferences, job attributes, expected score)
+SALARY_CASES = (
+    pytest.param({}, {"salary_min": 100000, "salary_max": 150000}, 100.0, id="no_salary_preference"),
+    pytest.param({"min_salary": 100000}, {}, 50.0, id="no_job_salary_info"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 100000, "salary_max": 150000}, 100.0, id="meets_minimum"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 95000}, 80.0, id="close_to_minimum"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 90000}, 80.0, id="exactly_90_percent"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 85000}, 60.0, id="somewhat_close"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 80000}, 60.0, id="exactly_80_percent"),
+    pytest.param({"min_salary": 100000}, {"salary_min": 60000}, 30.0, id="below_expectations"),
+    # Only salary_max known and below minimum: no salary_min to place in a band
+    pytest.param({"min_salary": 100000}, {"salary_max": 95000}, 30.0, id="max_only_below_minimum"),
+)
 
 
 class TestCalculateSalaryMatch:
     """Test salary matching"""
 
-    def test_no_salary_preference(self):
-        """Test when user has no salary preference"""
-        job = MagicMock()
-        job.salary_min = 100000
-        job.salary_max = 150000
-
-        score = calculate_salary_match({}, job)
-        assert score == 100.0
-
-    def test_no_job_salary_info(self):
-        """Test when job has no salary info"""
-        job = MagicMock()
-        job.salary_min = None
-        job.salary_max = None
-
-        score = calculate_salary_match({"min_salary": 100000}, job)
-        assert score == 50.0
-
-    def test_salary_meets_minimum(self):
-        """Test when salary meets minimum requirement"""
-        job = MagicMock()
-        job.salary_min = 100000
-        job.salary_max = 150000
-
-        score = calculate_salary_match({"min_salary": 100000}, job)
-        assert score == 100.0
-
-    def test_salary_close_to_minimum(self):
-        """Test when salary is close to minimum (within 90%)"""
-        job = MagicMock()
-        job.salary_min = 95000
-        job.salary_max = None
-
-        score = calculate_salary_match({"min_salary": 100000}, job)
-        assert score == 80.0
-
-    def test_salary_somewhat_close(self):
-        """Test when salary is somewhat close (within 80%)"""
-        job = MagicMock()
-        job.salary_min = 85000
-        job.salary_max = None
-
-        score = calculate_salary_match({"min_salary": 100000}, job)
-        assert score == 60.0
-
-    def test_salary_below_expectations(self):
-        """Test when salary is well below expectations"""
-        job = MagicMock()
-        job.salary_min = 60000
-        job.salary_max = None
-
-        score = calculate_salary_match({"min_salary": 100000}, job)
-        assert score == 30.0
+    @pytest.mark.parametrize("prefs,attrs,expected", SALARY_CASES)
+    def test_calculate_salary_match(self, prefs, attrs, expected):
+        """Test salary score bands relative to the user's minimum salary"""
+        assert calculate_salary_match(prefs, _job(**attrs)) == expected
+
+
+# (user experience_years, job requirements, expected score)
+EXPERIENCE_CASES = (
+    pytest.param(None, {}, 50.0, id="no_experience_info"),
+    pytest.param(5, {}, 50.0, id="no_job_experience_requirement"),
+    pytest.param(5, {"experience_years_min": 3, "experience_years_max": 7}, 100.0, id="within_range"),
+    pytest.param(3, {"experience_years_min": 3}, 100.0, id="exactly_minimum"),
+    pytest.param(2, {"experience_years_min": 3}, 80.0, id="slightly_under_experienced"),
+    pytest.param(1, {"experience_years_min": 3}, 60.0, id="under_experienced"),
+    pytest.param(1, {"experience_years_min": 3.5}, 40.0, id="fractional_gap_past_last_band"),
+    pytest.param(1, {"experience_years_min": 5}, 40.0, id="very_under_experienced"),
+    pytest.param(15, {"experience_years_min": 3, "experience_years_max": 7}, 90.0, id="over_experienced"),
+)
 
 
 class TestCalculateExperienceMatch:
     """Test experience matching"""
 
-    def test_no_experience_info(self):
-        """Test when no experience info available"""
-        user = MagicMock()
-        user.experience_years = None
-
-        score = calculate_experience_match(user, {})
-        assert score == 50.0
-
-    def test_no_job_experience_requirement(self):
-        """Test when job has no experience requirement"""
-        user = MagicMock()
-        user.experience_years = 5
-
-        score = calculate_experience_match(user, {})
-        assert score == 50.0
-
-    def test_perfect_experience_match(self):
-        """Test when experience is within range"""
-        user = MagicMock()
-        user.experience_years = 5
-
-        score = calculate_experience_match(user, {
-            "experience_years_min": 3,
-            "experience_years_max": 7
-        })
-        assert score == 100.0
-
-    def test_slightly_under_experienced(self):
-        """Test when user is slightly under-experienced"""
-        user = MagicMock()
-        user.experience_years = 2
-
-        score = calculate_experience_match(user, {"experience_years_min": 3})
-        assert score == 80.0
-
-    def test_under_experienced(self):
-        """Test when user is under-experienced by 2 years"""
-        user = MagicMock()
-        user.experience_years = 1
-
-        score = calculate_experience_match(user, {"experience_years_min": 3})
-        assert score == 60.0
-
-    def test_very_under_experienced(self):
-        """Test when user is very under-experienced"""
-        user = MagicMock()
-        user.experience_years = 1
-
-        score = calculate_experience_match(user, {"experience_years_min": 5})
-        assert score == 40.0
-
-    def test_over_experienced(self):
-        """Test when user is over-experienced"""
-        user = MagicMock()
-        user.experience_years = 15
-
-        score = calculate_experience_match(user, {
-            "experience_years_min": 3,
-            "experience_years_max": 7
-        })
-        assert score == 90.0
+    @pytest.mark.parametrize("user_years,requirements,expected", EXPERIENCE_CASES)
+    def test_calculate_experience_match(self, user_years, requirements, expected):
+        """Test experience score bands relative to the job's required years"""
+        user = SimpleNamespace(experience_years=user_years)
+        assert calculate_experience_match(user, requirements) == expected
+
+
+# Lowercased titles whose keywords overlap or share offsets ("sre" also contains "sr")
+TITLE_ROLE_TEXTS = (
+    "staff sre",
+    "senior backend python developer",
+    "machine learning engineer",
+    "product designer ux/ui",
+    "head of people operations",
+    "cloud platform engineer",
+    "accountant",
+)
 
 
 class TestCalculateTitleMatch:
     """Test job title matching"""
 
+    @pytest.mark.parametrize("title_text", TITLE_ROLE_TEXTS)
+    def test_title_roles_match_substring_scan(self, title_text):
+        """Test the single-pass keyword scan agrees with a per-keyword substring check"""
+        expected = {
+            role for role, keywords in TITLE_ROLE_KEYWORDS.items()
+            if any(kw in title_text for kw in keywords)
+        }
+        assert _title_roles(title_text) == expected
+
     def test_no_target_roles(self):
         """Test when user has no target roles"""
-        user = MagicMock()
-        user.preferences = {}
-        job = MagicMock()
-        job.title = "Software Engineer"
+        user = SimpleNamespace(preferences={})
+        job = _job(title="Software Engineer")
 
         score = calculate_title_match(user, job)
         assert score == 50.0
 
     def test_matching_engineer_role(self):
         """Test matching engineer role"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Backend Developer"]}
-        job = MagicMock()
-        job.title = "Senior Software Engineer"
+        user = SimpleNamespace(preferences={"target_roles": ["Backend Developer"]})
+        job = _job(title="Senior Software Engineer")
 
         score = calculate_title_match(user, job)
         # Both are engineer roles, should score well
@@ -484,17 +445,15 @@ class TestCalculateTitleMatch:
 
     def test_inferred_roles_from_cv(self):
         """Test target roles inferred from CV experience"""
-        user = MagicMock()
-        user.preferences = {
+        user = SimpleNamespace(preferences={
             "parsed_cv": {
                 "experience": [
                     {"title": "Senior Developer"},
                     {"title": "Software Engineer"}
                 ]
             }
-        }
-        job = MagicMock()
-        job.title = "Backend Engineer"
+        })
+        job = _job(title="Backend Engineer")
 
         score = calculate_title_match(user, job)
         # Should use CV titles and match engineer role
@@ -502,10 +461,8 @@ class TestCalculateTitleMatch:
 
     def test_ic_engineer_vs_manager_role(self):
         """Test IC engineer vs pure management role"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Software Engineer", "Backend Developer"]}
-        job = MagicMock()
-        job.title = "Product Manager"  # Pure management role without engineer keyword
+        user = SimpleNamespace(preferences={"target_roles": ["Software Engineer", "Backend Developer"]})
+        job = _job(title="Product Manager")  # Pure management role without engineer keyword
 
         score = calculate_title_match(user, job)
         # IC engineer shouldn't match pure management roles
@@ -513,10 +470,8 @@ class TestCalculateTitleMatch:
 
     def test_manager_vs_ic_role(self):
         """Test manager doesn't match pure IC roles"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Engineering Manager", "Technical Lead"]}
-        job = MagicMock()
-        job.title = "Software Engineer"  # IC role
+        user = SimpleNamespace(preferences={"target_roles": ["Engineering Manager", "Technical Lead"]})
+        job = _job(title="Software Engineer")  # IC role
 
         score = calculate_title_match(user, job)
         # Manager shouldn't match pure IC roles
@@ -524,10 +479,8 @@ class TestCalculateTitleMatch:
 
     def test_designer_role_match(self):
         """Test designer role matching"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["UX Designer", "Product Designer"]}
-        job = MagicMock()
-        job.title = "Senior UI Designer"
+        user = SimpleNamespace(preferences={"target_roles": ["UX Designer", "Product Designer"]})
+        job = _job(title="Senior UI Designer")
 
         score = calculate_title_match(user, job)
         # Designer roles should match
@@ -535,10 +488,8 @@ class TestCalculateTitleMatch:
 
     def test_data_role_match(self):
         """Test data role matching"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Data Scientist", "ML Engineer"]}
-        job = MagicMock()
-        job.title = "Machine Learning Engineer"
+        user = SimpleNamespace(preferences={"target_roles": ["Data Scientist", "ML Engineer"]})
+        job = _job(title="Machine Learning Engineer")
 
         score = calculate_title_match(user, job)
         # Data/ML roles should match
@@ -546,10 +497,8 @@ class TestCalculateTitleMatch:
 
     def test_devops_role_match(self):
         """Test DevOps role matching"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["DevOps Engineer"]}
-        job = MagicMock()
-        job.title = "DevOps Engineer"
+        user = SimpleNamespace(preferences={"target_roles": ["DevOps Engineer"]})
+        job = _job(title="DevOps Engineer")
 
         score = calculate_title_match(user, job)
         # DevOps roles should match
@@ -557,10 +506,8 @@ class TestCalculateTitleMatch:
 
     def test_keyword_overlap_good(self):
         """Test good keyword overlap in titles"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Frontend React Developer"]}
-        job = MagicMock()
-        job.title = "React JavaScript Developer"
+        user = SimpleNamespace(preferences={"target_roles": ["Frontend React Developer"]})
+        job = _job(title="React JavaScript Developer")
 
         score = calculate_title_match(user, job)
         # Both have "developer", "react" keywords (2+ overlap), should score 70
@@ -568,10 +515,8 @@ class TestCalculateTitleMatch:
 
     def test_keyword_overlap_some(self):
         """Test some keyword overlap"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Python Developer"]}
-        job = MagicMock()
-        job.title = "Python Architect"
+        user = SimpleNamespace(preferences={"target_roles": ["Python Developer"]})
+        job = _job(title="Python Architect")
 
         score = calculate_title_match(user, job)
         # 1 keyword overlap should score 50
@@ -579,10 +524,8 @@ class TestCalculateTitleMatch:
 
     def test_no_keyword_overlap(self):
         """Test no keyword overlap"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Python Developer"]}
-        job = MagicMock()
-        job.title = "Java Architect"
+        user = SimpleNamespace(preferences={"target_roles": ["Python Developer"]})
+        job = _job(title="Java Architect")
 
         score = calculate_title_match(user, job)
         # No overlap should score 20
@@ -590,10 +533,8 @@ class TestCalculateTitleMatch:
 
     def test_seniority_match_bonus(self):
         """Test seniority match gives bonus"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Senior Software Engineer"]}
-        job = MagicMock()
-        job.title = "Senior Backend Developer"
+        user = SimpleNamespace(preferences={"target_roles": ["Senior Software Engineer"]})
+        job = _job(title="Senior Backend Developer")
 
         score = calculate_title_match(user, job)
         # Should get engineer match (90) + seniority bonus (10) = 100
@@ -601,10 +542,8 @@ class TestCalculateTitleMatch:
 
     def test_seniority_mismatch_penalty(self):
         """Test seniority mismatch gives penalty"""
-        user = MagicMock()
-        user.preferences = {"target_roles": ["Senior Software Engineer"]}
-        job = MagicMock()
-        job.title = "Software Engineer"  # No senior
+        user = SimpleNamespace(preferences={"target_roles": ["Senior Software Engineer"]})
+        job = _job(title="Software Engineer")  # No senior
 
         score = calculate_title_match(user, job)
         # Should get engineer match (90) - seniority penalty (10) = 80
@@ -616,24 +555,20 @@ class TestCalculateMatchScore:
 
     def test_calculate_match_score_all_components(self):
         """Test that calculate_match_score combines all scoring components"""
-        from app.services.matching import calculate_match_score
-
-        user = MagicMock()
-        user.skills = ["Python", "Django"]
-        user.preferences = {"min_salary": 100000}
-        user.experience_years = 5
-
-        job = MagicMock()
-        job.title = "Senior Python Developer"
-        job.salary_min = 120000
-        job.salary_max = None
-        job.location = "Remote"
-        job.remote_type = "full"
-        job.job_type = "permanent"
-        # Add date fields for freshness calculation
-        job.posted_at = datetime.now(timezone.utc) - timedelta(days=3)
-        job.scraped_at = None
-        job.created_at = None
+        user = SimpleNamespace(
+            skills=["Python", "Django"],
+            preferences={"min_salary": 100000},
+            experience_years=5,
+        )
+
+        job = _job(
+            title="Senior Python Developer",
+            salary_min=120000,
+            location="Remote",
+            remote_type="full",
+            job_type="permanent",
+            posted_at=_days_ago(3),  # For freshness calculation
+        )
 
         job_requirements = {
             "required_skills": ["Python", "Django"],
@@ -647,43 +582,98 @@ class TestCalculateMatchScore:
         # Should return score and analysis dict
         assert isinstance(score, float)
         assert 0 <= score <= 100
-        assert "overall_score" in analysis
-        assert "skill_score" in analysis
-        assert "title_score" in analysis
-        assert "freshness_score" in analysis  # New field
-        assert "matching_skills" in analysis
-        assert "missing_skills" in analysis
-        assert "related_skills" in analysis  # New field
+        # One superset check so a failure names every missing key at once
+        assert analysis.keys() >= {
+            "overall_score",
+            "skill_score",
+            "title_score",
+            "freshness_score",
+            "matching_skills",
+            "missing_skills",
+            "related_skills",
+        }
+        assert analysis["overall_score"] == score
+        # Persisted with the match, so it must be a copy of the module weights
+        assert analysis["weights"] == MATCH_SCORE_WEIGHTS
+        assert analysis["weights"] is not MATCH_SCORE_WEIGHTS
+
+
+class TestCalculateMatchScoreCeiling:
+    """Test the pre-extraction upper bound on the match score"""
+
+    @pytest.mark.parametrize("requirements", [
+        pytest.param({"required_skills": ["Python", "Django"], "experience_years_min": 3}, id="perfect_requirements"),
+        pytest.param({"required_skills": ["Java"], "experience_years_min": 10}, id="poor_requirements"),
+    ])
+    def test_ceiling_bounds_match_score(self, requirements):
+        """Test calculate_match_score never exceeds the ceiling, whatever the requirements"""
+        user = SimpleNamespace(
+            skills=["Python", "Django"],
+            preferences={"min_salary": 100000, "target_roles": ["Backend Developer"]},
+            experience_years=5,
+        )
+        job = _match_job(title="Senior Python Developer", salary_min=90000, location="Remote")
+
+        score, _ = calculate_match_score(user, job, requirements)
+
+        assert score <= calculate_match_score_ceiling(user, job)
+
+    def test_ceiling_with_perfect_requirement_scores(self):
+        """Test the ceiling equals the score when skills and experience are both perfect"""
+        user = SimpleNamespace(skills=["Python"], preferences={}, experience_years=5)
+        job = _match_job(title="Developer")
+        requirements = {"required_skills": ["Python"], "nice_to_have_skills": ["Python"], "experience_years_min": 3}
+
+        score, _ = calculate_match_score(user, job, requirements)
+
+        assert score == calculate_match_score_ceiling(user, job)
+
+
+def _match_db():
+    """Session stub whose rejected/existing-match lookups both find nothing"""
+    db = Mock(spec=Session)
+    db.query.return_value.filter.return_value.first.return_value = None
+    return db
+
+
+def _match_job(**attrs):
+    """_job with the extra attributes create_match_for_job and the scorers read"""
+    return _job(**{
+        "company": "Test Co",
+        "description": "Test",
+        "remote_type": "full",
+        "posted_at": _days_ago(0),
+        **attrs,
+    })
+
+
+@pytest.fixture
+def mock_extract(monkeypatch):
+    """Stub out the LLM requirement extraction create_match_for_job calls"""
+    stub = MagicMock()
+    monkeypatch.setattr("app.services.matching.extract_job_requirements", stub)
+    return stub
+
+
+# (user_preferences, job attributes) rejected by the filters that run before extraction
+PRE_LLM_FILTER_CASES = (
+    pytest.param({"remote_types": ["full"]}, {"remote_type": "onsite"}, id="remote_type_mismatch"),
+    pytest.param({"eligible_regions": ["Asia"]}, {"eligible_regions": ["USA"]}, id="region_mismatch"),
+    pytest.param({"needs_visa_sponsorship": True}, {"visa_sponsorship": 0}, id="no_visa_sponsorship"),
+)
 
 
 class TestCreateMatchForJob:
     """Test create_match_for_job function error paths"""
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_create_match_llm_returns_none(self, mock_extract):
         """Test when LLM fails to extract requirements"""
-        from app.services.matching import create_match_for_job
-
         mock_extract.return_value = None
 
-        db = MagicMock()
-        # First query checks for rejected/hidden - return None (no prior rejection)
-        db.query.return_value.filter.return_value.first.return_value = None
-
-        user = MagicMock()
-        user.id = 1
-        user.skills = ["Python"]
-        user.preferences = {}
-
-        job = MagicMock()
-        job.id = 1
-        job.title = "Developer"
-        job.company = "Test Co"
-        job.description = "Test"
-        job.remote_type = "full"
-        job.eligible_regions = None
-        job.visa_sponsorship = None
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Python"], preferences={})
+        job = _match_job(title="Developer")
 
         result = await create_match_for_job(db, user, job)
 
@@ -692,90 +682,130 @@ class TestCreateMatchForJob:
         mock_extract.assert_called_once()
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_create_match_score_below_threshold(self, mock_extract):
         """Test when match score is below threshold"""
-        from app.services.matching import create_match_for_job
-
         mock_extract.return_value = {
             "required_skills": ["Java", "Spring"],  # User has Python, not Java
             "nice_to_have_skills": []
         }
 
-        db = MagicMock()
-        # First query checks for rejected/hidden - return None (no prior rejection)
-        db.query.return_value.filter.return_value.first.return_value = None
-
-        user = MagicMock()
-        user.id = 1
-        user.skills = ["Python"]
-        user.preferences = {}
-        user.experience_years = None
-
-        job = MagicMock()
-        job.id = 1
-        job.title = "Java Developer"
-        job.company = "Test Co"
-        job.description = "Java role"
-        job.remote_type = "full"
-        job.salary_min = None
-        job.salary_max = None
-        job.location = None
-        job.eligible_regions = None
-        job.visa_sponsorship = None
-        job.posted_at = datetime.now(timezone.utc)
-        job.scraped_at = None
-        job.created_at = None
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Python"], preferences={}, experience_years=None)
+        job = _match_job(title="Java Developer", description="Java role")
 
         result = await create_match_for_job(db, user, job, min_score=75.0)
 
-        # Should return None when score is too low
+        # Should return None when score is too low (not via the error handler)
         assert result is None
+        db.rollback.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_create_match_database_error(self, mock_extract):
         """Test database error handling"""
-        from app.services.matching import create_match_for_job
-
         mock_extract.return_value = {
             "required_skills": ["Python"],
             "nice_to_have_skills": []
         }
 
-        db = MagicMock()
-        # First query checks for rejected/hidden - return None (no prior rejection)
-        # Second query checks for existing match - return None (new match)
-        db.query.return_value.filter.return_value.first.return_value = None
+        # Both lookups (rejected/hidden, then existing match) find nothing, so a new match is committed
+        db = _match_db()
         db.commit.side_effect = Exception("Database error")
 
-        user = MagicMock()
-        user.id = 1
-        user.skills = ["Python"]
-        user.preferences = {"target_roles": ["Python Developer"]}
-        user.experience_years = 5
-
-        job = MagicMock()
-        job.id = 1
-        job.title = "Python Developer"
-        job.company = "Test Co"
-        job.description = "Python role"
-        job.remote_type = "full"
-        job.salary_min = 100000
-        job.salary_max = 150000
-        job.location = "Remote"
-        job.eligible_regions = None
-        job.visa_sponsorship = None
-        job.posted_at = datetime.now(timezone.utc)
-        job.scraped_at = None
-        job.created_at = None
+        user = SimpleNamespace(
+            id=1,
+            skills=["Python"],
+            preferences={"target_roles": ["Python Developer"]},
+            experience_years=5,
+        )
+        job = _match_job(
+            title="Python Developer",
+            description="Python role",
+            salary_min=100000,
+            salary_max=150000,
+            location="Remote",
+        )
 
         result = await create_match_for_job(db, user, job)
 
         # Should return None and rollback on database error
         assert result is None
+        db.commit.assert_called_once()
         db.rollback.assert_called_once()
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("prefs,attrs", PRE_LLM_FILTER_CASES)
+    async def test_hard_filters_skip_llm(self, mock_extract, prefs, attrs):
+        """Test preference hard filters reject the job before any LLM extraction"""
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Python"], preferences=prefs)
+
+        result = await create_match_for_job(db, user, _match_job(title="Developer", **attrs))
+
+        assert result is None
+        mock_extract.assert_not_called()
+        db.rollback.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_score_ceiling_below_threshold_skips_llm(self, mock_extract):
+        """Test a job whose best possible score misses min_score is skipped before extraction"""
+        db = _match_db()
+        # IC engineer vs pure management title caps the title score at 10
+        user = SimpleNamespace(id=1, skills=["Python"], preferences={"target_roles": ["Software Engineer"]})
+        job = _match_job(title="Product Manager")
+
+        result = await create_match_for_job(db, user, job, min_score=95.0)
+
+        assert result is None
+        mock_extract.assert_not_called()
+        db.rollback.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_mixed_case_skill_passes_minimum_skills_filter(self, mock_extract):
+        """Test a skill differing only in case matches through the hard filter and the score"""
+        mock_extract.return_value = {"required_skills": ["custom framework"], "nice_to_have_skills": []}
+
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Custom Framework"], preferences={}, experience_years=None)
+        job = _match_job(title="Developer")
+
+        result = await create_match_for_job(db, user, job, min_score=0)
+
+        assert result is not None
+        db.add.assert_called_once_with(result)
+        assert result.reasoning["skill_score"] == 80.0
+        assert result.reasoning["matching_skills"] == ["custom framework"]
+
+    @pytest.mark.asyncio
+    async def test_partial_scores_computed_once(self, mock_extract, monkeypatch):
+        """Test the ceiling check and the final score share one set of partial scores"""
+        mock_extract.return_value = {"required_skills": ["Python"], "nice_to_have_skills": []}
+        salary_match = MagicMock(wraps=calculate_salary_match)
+        monkeypatch.setattr("app.services.matching.calculate_salary_match", salary_match)
+
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Python"], preferences={}, experience_years=None)
+
+        result = await create_match_for_job(db, user, _match_job(title="Developer"), min_score=0)
+
+        assert result is not None
+        salary_match.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_create_match_uses_cached_requirements(self, mock_extract):
+        """Test requirements already in requirements_cache skip the LLM extraction"""
+        db = _match_db()
+        user = SimpleNamespace(id=1, skills=["Python"], preferences={})
+        job = _match_job(title="Developer")
+
+        result = await create_match_for_job(
+            db, user, job, requirements_cache={job.id: {"required_skills": [], "nice_to_have_skills": []}}
+        )
+
+        # No skills in the cached requirements, so the job is skipped without calling the LLM
+        assert result is None
+        mock_extract.assert_not_called()
+        db.rollback.assert_not_called()
+
 
 class TestSkillClusters:
     """Test skill cluster semantic matching"""
@@ -784,6 +814,9 @@ class TestSkillClusters:
         """Test exact match returns 1.0"""
         assert calculate_skill_similarity("Python", "Python") == 1.0
         assert calculate_skill_similarity("python", "PYTHON") == 1.0
+        assert calculate_skill_similarity("Custom Framework", "custom framework") == 1.0
+        # Clustered skills without an alias entry are still found in any case
+        assert calculate_skill_similarity("celery", "Django") == 0.5
 
     def test_calculate_skill_similarity_related(self):
         """Test related skills return 0.5"""
@@ -817,6 +850,19 @@ class TestSkillClusters:
         assert "Pandas" in related
         assert "Python" not in related  # Should not include the skill itself
 
+    def test_get_skill_clusters(self):
+        """Test cluster lookup normalizes aliases and matches a scan of SKILL_CLUSTERS"""
+        assert get_skill_clusters("python") == {
+            name for name, skills in SKILL_CLUSTERS.items() if "Python" in skills
+        }
+        assert get_skill_clusters("postgres") == get_skill_clusters("PostgreSQL")
+
+    def test_unclustered_skill(self):
+        """Test a skill outside every cluster has no clusters and no related skills"""
+        assert get_skill_clusters("Custom Framework") == set()
+        assert get_related_skills("Custom Framework") == set()
+        assert are_skills_related("Custom Framework", "Python") is False
+
 
 class TestDetectJobSeniority:
     """Test job seniority detection"""
@@ -867,8 +913,7 @@ class TestShouldMatchSeniority:
 
     def test_no_seniority_filter(self):
         """Test when user has no seniority preference"""
-        job = MagicMock()
-        job.title = "Senior Developer"
+        job = _job(title="Senior Developer")
         job_requirements = {"experience_years_min": 5}
 
         assert should_match_seniority({}, job, job_requirements) is True
@@ -876,16 +921,14 @@ class TestShouldMatchSeniority:
 
     def test_seniority_filter_matches(self):
         """Test when seniority filter matches job"""
-        job = MagicMock()
-        job.title = "Senior Software Engineer"
+        job = _job(title="Senior Software Engineer")
         job_requirements = {"experience_years_min": 5}
 
         assert should_match_seniority({"seniority_filter": "senior"}, job, job_requirements) is True
 
     def test_seniority_filter_mismatch(self):
         """Test when seniority filter doesn't match job"""
-        job = MagicMock()
-        job.title = "Junior Developer"
+        job = _job(title="Junior Developer")
         job_requirements = {"experience_years_min": 0}
 
         # Senior looking at junior role
@@ -893,14 +936,11 @@ class TestShouldMatchSeniority:
 
     def test_junior_filter(self):
         """Test junior seniority filter"""
-        junior_job = MagicMock()
-        junior_job.title = "Junior Developer"
+        junior_job = _job(title="Junior Developer")
 
-        senior_job = MagicMock()
-        senior_job.title = "Senior Developer"
+        senior_job = _job(title="Senior Developer")
 
-        mid_job = MagicMock()
-        mid_job.title = "Software Developer"
+        mid_job = _job(title="Software Developer")
 
         prefs = {"seniority_filter": "junior"}
 
@@ -909,103 +949,44 @@ class TestShouldMatchSeniority:
         assert should_match_seniority(prefs, mid_job, {}) is False
 
 
-class TestCalculateFreshnessScore:
-    """Test job freshness scoring"""
-
-    def test_fresh_job_7_days(self):
-        """Test jobs posted within 7 days get 100"""
-        job = MagicMock()
-        job.posted_at = datetime.now(timezone.utc) - timedelta(days=3)
-        job.scraped_at = None
-        job.created_at = None
-
-        score = calculate_freshness_score(job)
-        assert score == 100.0
-
-    def test_job_7_to_14_days(self):
-        """Test jobs 7-14 days old get 95"""
-        job = MagicMock()
-        job.posted_at = datetime.now(timezone.utc) - timedelta(days=10)
-        job.scraped_at = None
-        job.created_at = None
-
-        score = calculate_freshness_score(job)
-        assert score == 95.0
-
-    def test_job_14_to_30_days(self):
-        """Test jobs 14-30 days old get 85"""
-        job = MagicMock()
-        job.posted_at = datetime.now(timezone.utc) - timedelta(days=20)
-        job.scraped_at = None
-        job.created_at = None
-
-        score = calculate_freshness_score(job)
-        assert score == 85.0
-
-    def test_job_over_30_days(self):
-        """Test jobs over 30 days old get 70"""
-        job = MagicMock()
-        job.posted_at = datetime.now(timezone.utc) - timedelta(days=45)
-        job.scraped_at = None
-        job.created_at = None
-
-        score = calculate_freshness_score(job)
-        assert score == 70.0
-
-    def test_falls_back_to_scraped_at(self):
-        """Test falling back to scraped_at when posted_at is None"""
-        job = MagicMock()
-        job.posted_at = None
-        job.scraped_at = datetime.now(timezone.utc) - timedelta(days=5)
-        job.created_at = None
-
-        score = calculate_freshness_score(job)
-        assert score == 100.0
-
-    def test_falls_back_to_created_at(self):
-        """Test falling back to created_at when both dates are None"""
-        job = MagicMock()
-        job.posted_at = None
-        job.scraped_at = None
-        job.created_at = datetime.now(timezone.utc) - timedelta(days=25)
+# (job date attributes as days ago, expected score); posted_at wins over scraped_at over created_at
+FRESHNESS_CASES = (
+    pytest.param({"posted_at": 3}, 100.0, id="within_7_days"),
+    pytest.param({"posted_at": 10}, 95.0, id="7_to_14_days"),
+    pytest.param({"posted_at": 20}, 85.0, id="14_to_30_days"),
+    pytest.param({"posted_at": 45}, 70.0, id="over_30_days"),
+    pytest.param({"scraped_at": 5}, 100.0, id="falls_back_to_scraped_at"),
+    pytest.param({"created_at": 25}, 85.0, id="falls_back_to_created_at"),
+    pytest.param({"posted_at": 3, "scraped_at": 45}, 100.0, id="posted_at_preferred"),
+    pytest.param({}, 85.0, id="no_date_info"),  # Default moderate score
+)
 
-        score = calculate_freshness_score(job)
-        assert score == 85.0
 
-    def test_no_date_info(self):
-        """Test when no date information is available"""
-        job = MagicMock()
-        job.posted_at = None
-        job.scraped_at = None
-        job.created_at = None
+class TestCalculateFreshnessScore:
+    """Test job freshness scoring"""
 
-        score = calculate_freshness_score(job)
-        assert score == 85.0  # Default moderate score
+    @pytest.mark.parametrize("ages,expected", FRESHNESS_CASES)
+    def test_calculate_freshness_score(self, ages, expected):
+        """Test freshness bands by job age, using the first available date field"""
+        job = _job(**{field: _days_ago(days) for field, days in ages.items()})
+        assert calculate_freshness_score(job) == expected
 
 
 class TestFeedbackLoop:
     """Test user feedback loop (exclude rejected matches)"""
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_skips_rejected_job(self, mock_extract):
         """Test that rejected jobs are skipped"""
-        from app.services.matching import create_match_for_job
-        from app.models import Match
-
-        db = MagicMock()
+        db = _match_db()
 
         # Mock existing rejected match
-        mock_rejected = MagicMock()
-        mock_rejected.status = "rejected"
+        mock_rejected = SimpleNamespace(status="rejected")
         db.query.return_value.filter.return_value.first.return_value = mock_rejected
 
-        user = MagicMock()
-        user.id = 1
-        user.preferences = {}
+        user = SimpleNamespace(id=1, preferences={})
 
-        job = MagicMock()
-        job.id = 100
+        job = _job(id=100)
 
         result = await create_match_for_job(db, user, job)
 
@@ -1015,25 +996,17 @@ class TestFeedbackLoop:
         mock_extract.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_skips_hidden_job(self, mock_extract):
         """Test that hidden jobs are skipped"""
-        from app.services.matching import create_match_for_job
-        from app.models import Match
-
-        db = MagicMock()
+        db = _match_db()
 
         # Mock existing hidden match
-        mock_hidden = MagicMock()
-        mock_hidden.status = "hidden"
+        mock_hidden = SimpleNamespace(status="hidden")
         db.query.return_value.filter.return_value.first.return_value = mock_hidden
 
-        user = MagicMock()
-        user.id = 1
-        user.preferences = {}
+        user = SimpleNamespace(id=1, preferences={})
 
-        job = MagicMock()
-        job.id = 100
+        job = _job(id=100)
 
         result = await create_match_for_job(db, user, job)
 
@@ -1043,85 +1016,63 @@ class TestFeedbackLoop:
         mock_extract.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_skips_job_with_no_skills_extracted(self, mock_extract):
         """Test that jobs with no extracted skills are skipped"""
-        from app.services.matching import create_match_for_job
-
         mock_extract.return_value = {
             "required_skills": [],  # No skills
             "nice_to_have_skills": []  # No skills
         }
 
-        db = MagicMock()
-        db.query.return_value.filter.return_value.first.return_value = None
+        db = _match_db()
 
-        user = MagicMock()
-        user.id = 1
-        user.skills = ["Python", "Django"]
-        user.preferences = {}
+        user = SimpleNamespace(id=1, skills=["Python", "Django"], preferences={})
 
-        job = MagicMock()
-        job.id = 100
-        job.title = "Senior Research Engineer"
-        job.company = "AI Institute"
-        job.description = "Work on AI"
-        job.remote_type = "full"
-        job.eligible_regions = None
-        job.visa_sponsorship = None
+        job = _match_job(id=100, title="Senior Research Engineer", company="AI Institute", description="Work on AI")
 
         result = await create_match_for_job(db, user, job)
 
-        # Should return None - no skills extracted
+        # Should return None - no skills extracted (not via the error handler)
         assert result is None
+        db.rollback.assert_not_called()
 
     @pytest.mark.asyncio
-    @patch('app.services.matching.extract_job_requirements')
     async def test_skips_job_with_no_skill_overlap(self, mock_extract):
         """Test that jobs with zero skill overlap are skipped"""
-        from app.services.matching import create_match_for_job
-
         # Use skills that are NOT in any shared cluster with user's skills
         mock_extract.return_value = {
             "required_skills": ["Figma", "Sketch", "Adobe XD"],  # Design tools
             "nice_to_have_skills": ["Illustrator"]
         }
 
-        db = MagicMock()
-        db.query.return_value.filter.return_value.first.return_value = None
-
-        user = MagicMock()
-        user.id = 1
-        user.skills = ["Python", "Django", "PostgreSQL"]  # Backend skills - no cluster overlap with design
-        user.preferences = {"target_roles": ["Software Engineer"]}
-        user.experience_years = 5
-
-        job = MagicMock()
-        job.id = 100
-        job.title = "UI Designer"
-        job.company = "Design Co"
-        job.description = "Design work"
-        job.remote_type = "full"
-        job.salary_min = 100000
-        job.salary_max = 150000
-        job.location = "Remote"
-        job.eligible_regions = None
-        job.visa_sponsorship = None
-        job.posted_at = datetime.now(timezone.utc)
-        job.scraped_at = None
-        job.created_at = None
+        db = _match_db()
+
+        user = SimpleNamespace(
+            id=1,
+            skills=["Python", "Django", "PostgreSQL"],  # Backend skills - no cluster overlap with design
+            preferences={"target_roles": ["Software Engineer"]},
+            experience_years=5,
+        )
+
+        job = _match_job(
+            id=100,
+            title="UI Designer",
+            company="Design Co",
+            description="Design work",
+            salary_min=100000,
+            salary_max=150000,
+            location="Remote",
+        )
 
         result = await create_match_for_job(db, user, job)
 
-        # Should return None - no skill overlap (design vs backend)
+        # Should return None - no skill overlap (design vs backend), not via the error handler
         assert result is None
+        db.rollback.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_match_user_with_all_jobs_excludes_rejected(self):
         """Test that match_user_with_all_jobs pre-filters rejected jobs"""
-        from app.services.matching import match_user_with_all_jobs
-
-        db = MagicMock()
+        db = Mock(spec=Session)
 
         # First query: Match.job_id query for rejected jobs
         mock_rejected_subquery = MagicMock()
@@ -1137,13 +1088,75 @@ class TestFeedbackLoop:
         # Set up query side effects based on call order
         db.query.side_effect = [mock_rejected_subquery, mock_jobs_query]
 
-        user = MagicMock()
-        user.id = 1
-        user.preferences = {}
-        user.skills = []
+        user = SimpleNamespace(id=1, preferences={}, skills=[])
 
         result = await match_user_with_all_jobs(db, user)
 
         assert result == []
         # Verify that query was called twice (once for rejected, once for jobs)
         assert db.query.call_count == 2
+
+
+class TestMatchJobWithAllUsers:
+    """Test fan-out of one job to every active user"""
+
+    @staticmethod
+    def _users_db(*users):
+        """_match_db whose active-user query returns the given users"""
+        db = _match_db()
+        db.query.return_value.filter.return_value.all.return_value = list(users)
+        return db
+
+    @staticmethod
+    def _user(user_id, **prefs):
+        return SimpleNamespace(id=user_id, skills=["Python"], preferences=prefs)
+
+    @pytest.mark.asyncio
+    async def test_extracts_requirements_once_for_all_users(self, mock_extract):
+        """Test requirements are extracted once and shared across users"""
+        # No skills extracted, so every user stops right after the requirements lookup
+        mock_extract.return_value = {"required_skills": [], "nice_to_have_skills": []}
+        db = self._users_db(self._user(1), self._user(2), self._user(3))
+
+        result = await match_job_with_all_users(db, _match_job(title="Python Developer"))
+
+        assert result == []
+        mock_extract.assert_called_once()
+        db.rollback.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_extraction_failure_is_not_retried(self, mock_extract):
+        """Test a failed extraction is reused instead of re-calling the LLM per user"""
+        mock_extract.return_value = None
+        db = self._users_db(self._user(1), self._user(2))
+
+        result = await match_job_with_all_users(db, _match_job(title="Developer"))
+
+        assert result == []
+        mock_extract.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_users_failing_hard_filters_skip_extraction(self, mock_extract):
+        """Test no extraction happens when every user fails a pre-LLM filter"""
+        db = self._users_db(
+            self._user(1, remote_types=["full"]),
+            self._user(2, eligible_regions=["Asia"]),
+        )
+        job = _match_job(title="Developer", remote_type="onsite", eligible_regions=["USA"])
+
+        result = await match_job_with_all_users(db, job)
+
+        assert result == []
+        mock_extract.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_extracts_for_first_user_passing_filters(self, mock_extract):
+        """Test extraction waits for a user that passes the pre-LLM filters"""
+        mock_extract.return_value = {"required_skills": [], "nice_to_have_skills": []}
+        db = self._users_db(self._user(1, remote_types=["full"]), self._user(2), self._user(3))
+        job = _match_job(title="Developer", remote_type="onsite")
+
+        result = await match_job_with_all_users(db, job)
+
+        assert result == []
+        mock_extract.assert_called_once()